@@ -0,0 +1,58 @@
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+
+from .cache import get_user_snapshot
+
+# JWT claim holding the user's token_version at the time the token was issued
+TOKEN_VERSION_CLAIM = 'token_version'
+
+class VersionedRefreshToken(RefreshToken):
+  """
+  Refresh token carrying the user's token version; the access tokens derived from it copy the claim.
+  """
+  @classmethod
+  def for_user(cls, user):
+    token = super().for_user(user)
+    token[TOKEN_VERSION_CLAIM] = user.token_version
+    return token
+
+class CachedJWTAuthentication(BaseAuthentication):
+  """
+  DRF authentication class resolving the JWT user through the user snapshot cache.
+
+  An expired access token is replaced using the 'Refresh' header; the new access
+  token is left on request.refreshed_access_token for the view to hand back.
+  """
+  def authenticate(self, request):
+    auth_header = request.headers.get('Authorization')
+    if auth_header is None:
+      return None
+
+    try:
+      access_token = AccessToken(auth_header.split()[1])
+    except TokenError:
+      refresh_token = request.headers.get('Refresh')
+      if refresh_token is None:
+        raise AuthenticationFailed('Access token is expired and no refresh token provided')
+      try:
+        new_access_token = str(RefreshToken(refresh_token).access_token)
+      except TokenError as e:
+        raise AuthenticationFailed(f'Refresh token error: {str(e)}')
+      access_token = AccessToken(new_access_token)
+      request.refreshed_access_token = new_access_token
+    except IndexError:
+      raise AuthenticationFailed('Authorization header must be "Bearer <token>"')
+
+    # Tokens issued before versioning carry no claim and match the initial version
+    user = get_user_snapshot(access_token['user_id'], access_token.get(TOKEN_VERSION_CLAIM, 0))
+    if user is None:
+      raise AuthenticationFailed('User not found or token revoked')
+    if not user.is_active:
+      raise AuthenticationFailed('This account is inactive')
+
+    return user, access_token
+
+  def authenticate_header(self, request):
+    return 'Bearer'
@@ -0,0 +1,81 @@
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache
+
+from authentication.models import CustomUser
+
+SNAPSHOT_FIELDS = ('id', 'email', 'username', 'team', 'is_active', 'is_admin', 'token_version')
+
+class UserSnapshot:
+  """
+  Lightweight, read-only stand-in for CustomUser on authenticated requests.
+  """
+  __slots__ = SNAPSHOT_FIELDS
+
+  is_authenticated = True
+  is_anonymous = False
+
+  def __init__(self, **values):
+    for field in SNAPSHOT_FIELDS:
+      setattr(self, field, values[field])
+
+  @property
+  def pk(self):
+    return self.id
+
+  @property
+  def is_staff(self):
+    return self.is_admin
+
+  def as_dict(self):
+    return {field: getattr(self, field) for field in SNAPSHOT_FIELDS}
+
+  def __str__(self):
+    return self.email
+
+_local_users = TTLCache(maxsize=settings.AUTH_USER_CACHE['MAXSIZE'], ttl=settings.AUTH_USER_CACHE['TTL'])
+_local_lock = threading.Lock()
+
+def _shared_key(user_id, token_version):
+  return f"auth:user:{user_id}:{token_version}"
+
+def get_user_snapshot(user_id, token_version=0):
+  """
+  Function to resolve a token's user id and token version to a UserSnapshot.
+
+  Snapshots are cached per user and token version: the short-lived in-process LRU first,
+  then the shared cache when enabled, and only then the database. Returns None for unknown
+  users and for tokens whose version was revoked.
+  """
+  key = (user_id, token_version)
+  with _local_lock:
+    snapshot = _local_users.get(key)
+  if snapshot is not None:
+    return snapshot
+
+  values = cache.get(_shared_key(user_id, token_version)) if settings.AUTH_USER_CACHE['SHARED'] else None
+  if values is None:
+    values = CustomUser.objects.filter(id=user_id).values(*SNAPSHOT_FIELDS).first()
+    if values is None or values['token_version'] != token_version:
+      return None
+    if settings.AUTH_USER_CACHE['SHARED']:
+      cache.set(_shared_key(user_id, token_version), values, settings.AUTH_USER_CACHE['SHARED_TTL'])
+
+  snapshot = UserSnapshot(**values)
+  with _local_lock:
+    _local_users[key] = snapshot
+  return snapshot
+
+def invalidate_user(user_id, token_versions):
+  """
+  Function to drop a user's cached snapshots for the given token versions, e.g. after
+  deactivation, a team change or a revocation. Other processes drop their local copy
+  when its TTL runs out.
+  """
+  with _local_lock:
+    for token_version in token_versions:
+      _local_users.pop((user_id, token_version), None)
+  if settings.AUTH_USER_CACHE['SHARED']:
+    cache.delete_many([_shared_key(user_id, token_version) for token_version in token_versions])
@@ -0,0 +1,105 @@
+# hashing.py
+import asyncio, threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+  Argon2PasswordHasher, BCryptSHA256PasswordHasher, check_password, get_hasher, identify_hasher,
+  is_password_usable, make_password
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+  """
+  bcrypt with its work factor taken from PASSWORD_HASHING['BCRYPT_ROUNDS'].
+  """
+  @property
+  def rounds(self):
+    return settings.PASSWORD_HASHING['BCRYPT_ROUNDS']
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+  """
+  argon2 with its cost parameters taken from PASSWORD_HASHING; needs argon2-cffi.
+  """
+  @property
+  def time_cost(self):
+    return settings.PASSWORD_HASHING['ARGON2_TIME_COST']
+
+  @property
+  def memory_cost(self):
+    return settings.PASSWORD_HASHING['ARGON2_MEMORY_COST']
+
+  @property
+  def parallelism(self):
+    return settings.PASSWORD_HASHING['ARGON2_PARALLELISM']
+
+class HashingBusy(Exception):
+  """
+  Raised instead of queueing more password checks than PASSWORD_HASHING['QUEUE'] allows.
+  """
+
+def get_executor():
+  """
+  Function to return the process-wide pool the password hashes run on, sized by PASSWORD_HASHING['WORKERS'].
+  bcrypt and argon2 release the GIL, so hashing there leaves the event loop and request threads free.
+  """
+  global _executor, _slots
+  with _executor_lock:
+    if _executor is None:
+      _executor = ThreadPoolExecutor(
+        max_workers=settings.PASSWORD_HASHING['WORKERS'],
+        thread_name_prefix='password-hashing'
+      )
+      _slots = threading.BoundedSemaphore(settings.PASSWORD_HASHING['WORKERS'] + settings.PASSWORD_HASHING['QUEUE'])
+    return _executor
+
+async def run_hashing(function, *args):
+  executor = get_executor()
+  if not _slots.acquire(blocking=False):
+    raise HashingBusy()
+  try:
+    return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+  finally:
+    _slots.release()
+
+@lru_cache(maxsize=None)
+def dummy_hash():
+  """
+  Function to return a hash made with the current default hasher, checked against when the
+  user does not exist so that unknown emails take as long as wrong passwords.
+  """
+  return make_password('dummy password for timing')
+
+def verify_password(password, encoded):
+  """
+  Function to check a password and, when it matches but was hashed with an older hasher or
+  work factor, compute its new hash. Returns (valid, new_hash).
+  """
+  # Missing users and accounts without a password (Google sign-in) cost a full check too
+  if not encoded or not is_password_usable(encoded):
+    check_password(password, dummy_hash())
+    return False, None
+
+  valid = check_password(password, encoded)
+  if not valid:
+    return False, None
+
+  try:
+    hasher = identify_hasher(encoded)
+  except ValueError:
+    return True, None
+  default_hasher = get_hasher()
+  if hasher.algorithm != default_hasher.algorithm or default_hasher.must_update(encoded):
+    return True, make_password(password)
+  return True, None
+
+async def averify_password(password, encoded):
+  """
+  Function to run verify_password on the bounded hashing pool.
+  """
+  return await run_hashing(verify_password, password, encoded)
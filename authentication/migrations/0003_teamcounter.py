@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:40
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_team_counter(apps, schema_editor):
+    CustomUser = apps.get_model('authentication', 'CustomUser')
+    TeamCounter = apps.get_model('authentication', 'TeamCounter')
+    max_team = CustomUser.objects.aggregate(max_team=Max('team'))['max_team']
+    TeamCounter.objects.update_or_create(id=1, defaults={'value': max_team or 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_customuser_team'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_team_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_teamcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='token_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
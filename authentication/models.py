@@ -1,15 +1,46 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max
+
+# Primary key of the single TeamCounter row, seeded by migration 0003 or on first use
+TEAM_COUNTER_ID = 1
 
 # Create your models here.
+class TeamCounter(models.Model):
+  # Last team number handed out
+  value = models.IntegerField(default=0)
+
 class CustomUserManager(BaseUserManager):
-  def create_user(self, email, username, password=None):
+  def allocate_team(self):
+    """
+    Function to hand out the next team number. The counter row stays locked until the
+    surrounding transaction ends, so concurrent signups get distinct numbers. A missing row
+    (e.g. after a flush) is recreated from the highest team in use.
+    """
+    counters = TeamCounter.objects.using(self._db)
+    with transaction.atomic(using=self._db):
+      counter, _ = counters.select_for_update().get_or_create(
+        id=TEAM_COUNTER_ID,
+        defaults={'value': self.using(self._db).aggregate(max_team=Max('team'))['max_team'] or 0}
+      )
+      counters.filter(id=TEAM_COUNTER_ID).update(value=F('value') + 1)
+    return counter.value + 1
+
+  def create_user(self, email, username, password=None, team=None):
+    """
+    Function to create a user, with a new team unless one is given, in a single transaction.
+    A taken email raises IntegrityError from the unique constraint.
+    """
     if not email:
       raise ValueError('The email field must be set')
     email = self.normalize_email(email)
-    user = self.model(email=email, username=username)
+    user = self.model(email=email, username=username, team=team)
+    # Hashed before the transaction so the team counter lock is not held for the hash
     user.set_password(password)
-    user.save(using=self._db)
+    with transaction.atomic(using=self._db):
+      if team is None:
+        user.team = self.allocate_team()
+      user.save(using=self._db)
     return user
   
   def create_superuser(self, email, username, password=None):
@@ -24,6 +55,8 @@ class CustomUser(AbstractBaseUser):
   team = models.IntegerField()
   is_active = models.BooleanField(default=True)
   is_admin = models.BooleanField(default=False)
+  # Carried by every JWT issued to the user; bumping it revokes all of them
+  token_version = models.IntegerField(default=0)
 
   objects = CustomUserManager()
 
@@ -33,6 +66,19 @@ class CustomUser(AbstractBaseUser):
   def __str__(self):
       return self.email
 
+  def set_password(self, raw_password):
+      super().set_password(raw_password)
+      # A new user has no tokens yet; an existing one loses the tokens issued with the old password
+      if self.pk is not None:
+          self.token_version += 1
+
+  def revoke_tokens(self):
+      """
+      Function to invalidate every token issued to the user so far, e.g. on sign-out.
+      """
+      self.token_version += 1
+      self.save(update_fields=['token_version'])
+
   def has_perm(self, perm, obj=None):
       return True
 
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_user
+from .models import CustomUser
+
+@receiver(post_init, sender=CustomUser)
+def remember_token_version(sender, instance, **kwargs):
+  # Read from __dict__ so a deferred token_version is not loaded here
+  instance._loaded_token_version = instance.__dict__.get('token_version')
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+  # The snapshot cached for the version the user had when loaded goes too, so revoked tokens miss it
+  token_versions = {instance._loaded_token_version, instance.__dict__.get('token_version')} - {None}
+  invalidate_user(instance.id, token_versions)
+  instance._loaded_token_version = instance.__dict__.get('token_version')
@@ -1,3 +1,72 @@
-from django.test import TestCase
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
 
-# Create your tests here.
+from .authentication import CachedJWTAuthentication, VersionedRefreshToken
+from .cache import _local_users
+from .models import CustomUser, TeamCounter
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        _local_users.clear()
+        self.addCleanup(_local_users.clear)
+        self.user = CustomUser.objects.create_user(email='ada@example.com', username='ada')
+
+    def authenticate(self, access_token):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {access_token}")
+        user, _ = CachedJWTAuthentication().authenticate(request)
+        return user
+
+    def access_token(self):
+        return VersionedRefreshToken.for_user(self.user).access_token
+
+    def test_deactivation_invalidates_the_cached_snapshot(self):
+        access_token = self.access_token()
+        self.assertTrue(self.authenticate(access_token).is_active)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'This account is inactive'):
+            self.authenticate(access_token)
+
+    def test_team_change_invalidates_the_cached_snapshot(self):
+        access_token = self.access_token()
+        self.assertEqual(self.authenticate(access_token).team, self.user.team)
+
+        self.user.team += 1
+        self.user.save()
+
+        self.assertEqual(self.authenticate(access_token).team, self.user.team)
+
+    def test_password_change_revokes_issued_tokens(self):
+        access_token = self.access_token()
+        self.authenticate(access_token)
+
+        self.user.set_password('a new password')
+        self.user.save()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'token revoked'):
+            self.authenticate(access_token)
+        self.assertEqual(self.authenticate(self.access_token()).id, self.user.id)
+
+    def test_sign_out_revokes_issued_tokens(self):
+        access_token = self.access_token()
+        self.authenticate(access_token)
+
+        CustomUser.objects.get(id=self.user.id).revoke_tokens()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'token revoked'):
+            self.authenticate(access_token)
+
+
+class TeamAllocationTests(TestCase):
+    def test_missing_counter_is_seeded_from_the_highest_team(self):
+        CustomUser.objects.create_user(email='ada@example.com', username='ada', team=41)
+        TeamCounter.objects.all().delete()
+
+        grace = CustomUser.objects.create_user(email='grace@example.com', username='grace')
+        alan = CustomUser.objects.create_user(email='alan@example.com', username='alan')
+
+        self.assertEqual((grace.team, alan.team), (42, 43))
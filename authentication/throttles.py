@@ -0,0 +1,38 @@
+# throttles.py
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SignInRateThrottle(SimpleRateThrottle):
+  """
+  Limits sign-in attempts per client IP, with the 'sign_in' rate. The IP is taken from the
+  X-Forwarded-For entry added by the REST_FRAMEWORK['NUM_PROXIES'] trusted proxies.
+  """
+  scope = 'sign_in'
+
+  def get_cache_key(self, request, view):
+    return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+class SignInEmailRateThrottle(SimpleRateThrottle):
+  """
+  Limits sign-in attempts per account, with the 'sign_in_email' rate, whichever IPs they come from.
+  The email is read from request.sign_in_email, set by the view once it parsed the body.
+  """
+  scope = 'sign_in_email'
+
+  def get_cache_key(self, request, view):
+    email = getattr(request, 'sign_in_email', None)
+    if not email:
+      return None
+    return self.cache_format % {'scope': self.scope, 'ident': email.strip().lower()}
+
+def throttle_wait(request, throttle_classes=(SignInRateThrottle, SignInEmailRateThrottle)):
+  """
+  Function to apply the sign-in throttles outside of DRF views.
+  Returns the seconds to wait when one of them refuses the request, else None.
+  """
+  waits = []
+  for throttle_class in throttle_classes:
+    throttle = throttle_class()
+    if not throttle.allow_request(request, None):
+      waits.append(throttle.wait() or 1)
+  return max(waits) if waits else None
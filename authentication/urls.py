@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import Auth, SignUp, SignIn, GoogleLogin, GoogleCallbackView
+from .views import Auth, SignUp, SignOut, sign_in, GoogleLogin, GoogleCallbackView
 
 urlpatterns = [
   path('', Auth.as_view(), name='auth'),
   path('signup/', SignUp.as_view(), name='sign-up'),
-  path('signin/', SignIn.as_view(), name='sign-in'),
+  path('signin/', sign_in, name='sign-in'),
+  path('signout/', SignOut.as_view(), name='sign-out'),
   path('google/', GoogleLogin.as_view(), name='google-login'),
   path('google/callback/', GoogleCallbackView.as_view(), name='google-callback'),
 ]
\ No newline at end of file
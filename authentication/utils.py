@@ -2,23 +2,27 @@ from authentication.models import CustomUser
 
 from django.contrib.auth.backends import ModelBackend
 
-from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
-from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework import status
 
+from asgiref.sync import sync_to_async
 from functools import wraps
 
+from .authentication import CachedJWTAuthentication
+from .hashing import verify_password
+
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = CustomUser.objects.get(email=username)
-        except CustomUser.DoesNotExist:
+        user = CustomUser.objects.filter(email=username).first()
+        valid, new_hash = verify_password(password, user.password if user else None)
+        if user is None or not valid:
             return None
 
-        if user.check_password(password):
-            return user
-        return None
+        if new_hash:
+            user.password = new_hash
+            user.save(update_fields=['password'])
+        return user
 
     def get_user(self, user_id):
         try:
@@ -29,44 +33,42 @@ class EmailBackend(ModelBackend):
 def token_required(f):
     @wraps(f)
     def wrapped_view(request, *args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        refresh_token = request.headers.get('Refresh')
-
-        if auth_header is None:
+        if request.headers.get('Authorization') is None:
             return Response({'error': 'Authorization header is expected'}, status=status.HTTP_401_UNAUTHORIZED)
 
         try:
-            token = auth_header.split()[1]
-            access_token = AccessToken(token)
-            
-            user_id = access_token['user_id']
-            request.user = CustomUser.objects.get(id=user_id)
-            return f(request, *args, **kwargs)
-        
-        except TokenError as e:
-            if refresh_token is None:
-                return Response({'error': 'Access token is expired and no refresh token provided'}, status=status.HTTP_401_UNAUTHORIZED)
-            
-            try:
-                refresh = RefreshToken(refresh_token)
-                new_access_token = str(refresh.access_token)
-
-                access_token = AccessToken(new_access_token)
-                user_id = access_token['user_id']
-                user = CustomUser.objects.get(id=user_id)
-
-                request.user = user
-
-                response = f(request, *args, **kwargs)
-                response.data['access'] = new_access_token
-                
-                return response
-            
-            except TokenError as e:
-                return Response({'error': f'Refresh token error: {str(e)}'}, status=status.HTTP_401_UNAUTHORIZED)
-            
+            # Resolved by CachedJWTAuthentication, registered in REST_FRAMEWORK's DEFAULT_AUTHENTICATION_CLASSES
+            if not request.user.is_authenticated:
+                raise AuthenticationFailed('Invalid token')
+        except AuthenticationFailed as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
         except Exception as e:
             print("General Exception:", str(e))
             return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
 
-    return wrapped_view
\ No newline at end of file
+        response = f(request, *args, **kwargs)
+
+        new_access_token = getattr(request, 'refreshed_access_token', None)
+        if new_access_token:
+            response.data['access'] = new_access_token
+
+        return response
+
+    return wrapped_view
+
+async def aget_token_user(request):
+    """
+    Async counterpart of token_required for plain Django async views.
+    Returns (user, new_access_token, error); new_access_token is only set when the refresh token was used.
+    """
+    if request.headers.get('Authorization') is None:
+        return None, None, 'Authorization header is expected'
+
+    try:
+        user, _ = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+        return user, getattr(request, 'refreshed_access_token', None), None
+    except AuthenticationFailed as e:
+        return None, None, str(e.detail)
+    except Exception as e:
+        print("General Exception:", str(e))
+        return None, None, str(e)
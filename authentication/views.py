@@ -1,21 +1,25 @@
-import uuid
+import json, uuid
 import urllib.parse
 
-from django.contrib.auth import authenticate
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.conf import settings
 from django.contrib.auth.models import update_last_login
 from django.utils.decorators import method_decorator
-from django.db import models
+from django.db import IntegrityError, transaction
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import Flow
 from google.oauth2 import id_token
+from asgiref.sync import sync_to_async
+from .authentication import VersionedRefreshToken
+from .hashing import HashingBusy, averify_password
 from .models import CustomUser
+from .throttles import throttle_wait
 from .utils import token_required
 
 class Auth(APIView):
@@ -30,60 +34,89 @@ class Auth(APIView):
      }
      return Response({'message': 'Success', 'user': user_data}, status=status.HTTP_200_OK)
 
+class SignOut(APIView):
+  @method_decorator(token_required)
+  def post(self, request):
+    user = CustomUser.objects.filter(id=request.user.id).first()
+    if user is not None:
+      user.revoke_tokens()
+    return Response({'message': 'User signed out successfully'}, status=status.HTTP_200_OK)
+
 class SignUp(APIView):
   def post(self, request):
     username = request.data.get('name')
     email = request.data.get('email')
     password = request.data.get('password')
 
-    if CustomUser.objects.filter(username=username).exists():
-      return Response({'error': 'Username already exists'}, status=status.HTTP_400_BAD_REQUEST)
+    if not username or not email or not password:
+      return Response({'error': 'Name, email and password are required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+      with transaction.atomic():
+        # Usernames are not unique (Google sign-in takes them from display names), so signup checks them itself
+        if CustomUser.objects.filter(username=username).exists():
+          return Response({'error': 'Username already exists'}, status=status.HTTP_400_BAD_REQUEST)
 
-    if CustomUser.objects.filter(email=email).exists():
+        CustomUser.objects.create_user(email=email, username=username, password=password)
+    except IntegrityError:
       return Response({'error': 'Email already exists'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    max_team = CustomUser.objects.aggregate(max_team=models.Max('team'))['max_team']
 
-    if max_team is None:
-       team = 1
-    else:
-       team = max_team + 1
+    return Response({'message': 'User created successfully'}, status=status.HTTP_200_OK)
     
-    user = CustomUser.objects.create(
-      username=username,
-      email=email,
-      team = team
+@csrf_exempt
+@require_POST
+async def sign_in(request):
+  """
+  Async sign-in view. The password check runs on the bounded hashing pool rather than on a
+  request thread, and attempts are throttled per client IP and per email.
+  """
+  try:
+    data = json.loads(request.body or b'{}') if request.content_type == 'application/json' else request.POST
+  except json.JSONDecodeError:
+    return JsonResponse({'error': 'Request body must be JSON.'}, status=status.HTTP_400_BAD_REQUEST)
+
+  email = data.get('email')
+  password = data.get('password')
+  if not email or not password:
+    return JsonResponse({'error': 'Email and password are required'}, status=status.HTTP_400_BAD_REQUEST)
+
+  request.sign_in_email = email
+  wait = await sync_to_async(throttle_wait)(request)
+  if wait is not None:
+    return JsonResponse(
+      {'error': 'Too many sign-in attempts, try again later'},
+      status=status.HTTP_429_TOO_MANY_REQUESTS,
+      headers={'Retry-After': str(int(wait) + 1)}
     )
-    user.set_password(password)
-    user.save()
 
-    return Response({'message': 'User created successfully'}, status=status.HTTP_200_OK)
-    
-class SignIn(APIView):
-    def post(self, request):
-        email = request.data.get('email')
-        password = request.data.get('password')
-
-        if not email or not password:
-            return Response({'error': 'Email and password are required'}, status=status.HTTP_400_BAD_REQUEST)
-
-        user = authenticate(request, username=email, password=password)
-
-        if user is not None:
-            if user.is_active:
-              refresh = RefreshToken.for_user(user)
-              update_last_login(None, user)
-              return Response({
-                'message': 'User signed in successfully',
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-              },
-              status=status.HTTP_200_OK)
-            else:
-               return Response({'error': 'This account is inactive'}, status=status.HTTP_400_BAD_REQUEST)
-               
-        return Response({'error': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
-        
+  user = await CustomUser.objects.filter(email=email).afirst()
+  try:
+    valid, new_hash = await averify_password(password, user.password if user else None)
+  except HashingBusy:
+    return JsonResponse(
+      {'error': 'Too many sign-in attempts in progress, try again shortly'},
+      status=status.HTTP_503_SERVICE_UNAVAILABLE,
+      headers={'Retry-After': '1'}
+    )
+
+  if user is None or not valid:
+    return JsonResponse({'error': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
+
+  # The password was hashed with an older hasher or work factor
+  if new_hash:
+    await CustomUser.objects.filter(id=user.id).aupdate(password=new_hash)
+
+  if not user.is_active:
+    return JsonResponse({'error': 'This account is inactive'}, status=status.HTTP_400_BAD_REQUEST)
+
+  refresh = VersionedRefreshToken.for_user(user)
+  await sync_to_async(update_last_login)(None, user)
+  return JsonResponse({
+    'message': 'User signed in successfully',
+    'refresh': str(refresh),
+    'access': str(refresh.access_token),
+  }, status=status.HTTP_200_OK)
+
 class GoogleLogin(APIView):
   def get(self, request, *args, **kwargs):
     flow = Flow.from_client_config(
@@ -124,13 +157,15 @@ class GoogleCallbackView(APIView):
       if not username:
         username = email.split('@')[0]
 
-      user, created = CustomUser.objects.get_or_create(email=email, defaults={'username': username})
-
-      if created:
-        user.set_unusable_password()
-        user.save()
+      user = CustomUser.objects.filter(email=email).first()
+      if user is None:
+        try:
+          # Without a password create_user leaves the account with an unusable one
+          user = CustomUser.objects.create_user(email=email, username=username)
+        except IntegrityError:
+          user = CustomUser.objects.get(email=email)
 
-      refresh = RefreshToken.for_user(user)
+      refresh = VersionedRefreshToken.for_user(user)
       params = {
         'refresh': str(refresh),
         'access': str(refresh.access_token)
@@ -0,0 +1,84 @@
+# answers.py
+import hashlib, re, threading
+
+from asgiref.sync import async_to_sync
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache
+
+from .chat import ASSISTANT_MODEL, ASSISTANT_INSTRUCTIONS, instructions_hash, get_openai_assistant_response
+from .rate_limits import acquire
+
+# Artifacts computed for every meeting as soon as it is finished
+STANDARD_ARTIFACTS = {
+    'summary': "Summarize this meeting.",
+    'action_items': "List the action items from this meeting, with their owners when they were mentioned.",
+    'speakers': "Give a breakdown of the speakers in this meeting and what each of them contributed.",
+}
+# Normalized phrasings that are answered by a standard artifact
+QUERY_ALIASES = {
+    'summarize this meeting': 'summary',
+    'summarize the meeting': 'summary',
+    'summarise this meeting': 'summary',
+    'meeting summary': 'summary',
+    'summary': 'summary',
+    'give me a summary': 'summary',
+    'list action items': 'action_items',
+    'list the action items': 'action_items',
+    'action items': 'action_items',
+    'what are the action items': 'action_items',
+    'speaker breakdown': 'speakers',
+    'who spoke': 'speakers',
+    'who said what': 'speakers',
+}
+for _artifact, _query in STANDARD_ARTIFACTS.items():
+    QUERY_ALIASES[re.sub(r'[^\w\s]', '', _query.lower()).strip()] = _artifact
+
+_local_answers = TTLCache(maxsize=settings.CHAT_ANSWER_CACHE['MAXSIZE'], ttl=settings.CHAT_ANSWER_CACHE['LOCAL_TTL'])
+_local_lock = threading.Lock()
+
+
+def normalize_query(query):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', query.lower()).split())
+
+def answer_key(query, vector_store_id):
+    """
+    Function to build the memoization key of a question: the normalized query (or the
+    standard artifact it asks for), the vector store and the assistant fingerprint.
+    """
+    normalized = normalize_query(query)
+    artifact = QUERY_ALIASES.get(normalized)
+    basis = f"artifact:{artifact}" if artifact else f"query:{normalized}"
+    fingerprint = f"{ASSISTANT_MODEL}:{instructions_hash(ASSISTANT_INSTRUCTIONS)}"
+    digest = hashlib.sha256(f"{fingerprint}|{vector_store_id}|{basis}".encode()).hexdigest()
+    return f"chat-answer:{digest}"
+
+def get_cached_answer(query, vector_store_id):
+    key = answer_key(query, vector_store_id)
+    with _local_lock:
+        answer = _local_answers.get(key)
+    if answer is not None:
+        return answer
+
+    answer = cache.get(key)
+    if answer is not None:
+        with _local_lock:
+            _local_answers[key] = answer
+    return answer
+
+def cache_answer(query, vector_store_id, answer, timeout=None):
+    key = answer_key(query, vector_store_id)
+    cache.set(key, answer, timeout if timeout is not None else settings.CHAT_ANSWER_CACHE['TTL'])
+    with _local_lock:
+        _local_answers[key] = answer
+
+def precompute_artifacts(vector_store_id):
+    """
+    Function to run the standard artifact questions for a meeting once and keep their answers.
+    """
+    for artifact, query in STANDARD_ARTIFACTS.items():
+        if get_cached_answer(query, vector_store_id) is not None:
+            continue
+        acquire('openai')
+        answer = async_to_sync(get_openai_assistant_response)(query, vector_store_id)
+        cache_answer(query, vector_store_id, answer, timeout=settings.CHAT_ANSWER_CACHE['ARTIFACT_TTL'])
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CalendarApiServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'calendar_api_service'
+
+    def ready(self):
+        from . import signals
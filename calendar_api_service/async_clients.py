@@ -0,0 +1,91 @@
+# async_clients.py
+import asyncio, json
+from datetime import datetime
+
+import httpx
+from django.conf import settings
+from google.auth.transport.requests import Request
+
+from .rate_limits import aacquire, defer, retry_after_seconds
+
+GOOGLE_CALENDAR_EVENTS_URL = 'https://www.googleapis.com/calendar/v3/calendars/primary/events'
+
+
+def build_http_client(max_connections):
+    """
+    Function to build the httpx client shared by every coroutine of one event loop.
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            settings.TRANSKRIPTOR_CLIENT['READ_TIMEOUT'],
+            connect=settings.TRANSKRIPTOR_CLIENT['CONNECT_TIMEOUT']
+        ),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    )
+
+class AsyncGoogleCalendarClient:
+    """
+    asyncio counterpart of list_calendar_events, calling the Calendar REST API over httpx.
+    """
+    def __init__(self, http):
+        self.http = http
+
+    async def get(self, credentials, params, limiter_key=None):
+        for _ in range(settings.RATE_LIMIT_MAX_DEFERRALS):
+            await aacquire('google', limiter_key)
+            response = await self.http.get(
+                GOOGLE_CALENDAR_EVENTS_URL,
+                params=params,
+                headers={'Authorization': f"Bearer {credentials.token}"}
+            )
+            if response.status_code != 429:
+                break
+            # Every other coroutine and worker holds off too until the quota refills
+            await asyncio.to_thread(defer, 'google', retry_after_seconds(response.headers))
+        if response.status_code == 401 and credentials.refresh_token:
+            # Same as AuthorizedHttp: refresh the access token once and replay the request
+            await asyncio.to_thread(credentials.refresh, Request())
+            await aacquire('google', limiter_key)
+            response = await self.http.get(
+                GOOGLE_CALENDAR_EVENTS_URL,
+                params=params,
+                headers={'Authorization': f"Bearer {credentials.token}"}
+            )
+        response.raise_for_status()
+        return response.json()
+
+    async def list_events(self, credentials, sync_token=None, limiter_key=None):
+        """
+        Function to page through the primary calendar's events and return (events, next_sync_token).
+        """
+        if sync_token:
+            params = {'syncToken': sync_token}
+        else:
+            params = {'timeMin': datetime.utcnow().isoformat() + 'Z'}
+
+        events = []
+        while True:
+            events_result = await self.get(credentials, params, limiter_key)
+            events.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return events, events_result.get('nextSyncToken')
+            params['pageToken'] = page_token
+
+class AsyncTranskriptorClient:
+    """
+    asyncio counterpart of TranskriptorClient.get_history, fetched alongside the calendar listings.
+    Joins, transcripts and durations stay on the Celery tasks, behind the client's retries and
+    circuit breaker.
+    """
+    def __init__(self, http):
+        self.http = http
+
+    async def get_history(self):
+        await aacquire('transkriptor')
+        response = await self.http.get(
+            settings.TRANSKRIPTOR_GET_HISTORY_URL,
+            params={"apiKey": settings.TRANSKRIPTOR_API_KEY}
+        )
+        response.raise_for_status()
+        return json.loads(json.loads(response.text))
@@ -0,0 +1,132 @@
+# async_sync.py
+import asyncio
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from google.auth.exceptions import RefreshError
+
+from .async_clients import AsyncGoogleCalendarClient, AsyncTranskriptorClient, build_http_client
+from .credentials import get_credentials, save_credentials
+from .models import GoogleCredentials
+from .sync import upsert_account_events
+from .utils import acquire_lock, release_lock
+from .watch import request_account_sync, sync_dirty_key
+
+
+async def list_account_events(calendar, google_credentials, credentials, semaphore):
+    """
+    Function to list one account's changed events, falling back to a full listing on 410 Gone.
+    CALENDAR_SYNC_ACCOUNT_TIMEOUT only starts once a concurrency slot is free, so accounts
+    queued behind the semaphore do not time out waiting for their turn.
+    """
+    sync_token = google_credentials.sync_token
+    async with semaphore:
+        return await asyncio.wait_for(
+            list_account_events_unbounded(calendar, google_credentials, credentials, sync_token),
+            timeout=settings.CALENDAR_SYNC_ACCOUNT_TIMEOUT
+        )
+
+async def list_account_events_unbounded(calendar, google_credentials, credentials, sync_token):
+    try:
+        return await calendar.list_events(credentials, sync_token, google_credentials.id)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code != 410 or not sync_token:
+            raise
+        print(f"Sync token expired for {google_credentials.email}, running a full resync")
+        return await calendar.list_events(credentials, limiter_key=google_credentials.id)
+
+async def fetch_fleet(credentials_list, credentials_by_id):
+    """
+    Function to list every account's events and the Transkriptor history on one event loop.
+    Per-account failures are returned in place of the result instead of being raised.
+    """
+    semaphore = asyncio.Semaphore(settings.CALENDAR_SYNC_CONCURRENCY)
+    async with build_http_client(settings.CALENDAR_SYNC_CONCURRENCY) as http:
+        calendar = AsyncGoogleCalendarClient(http)
+        transkriptor = AsyncTranskriptorClient(http)
+        return await asyncio.gather(
+            asyncio.gather(*[
+                list_account_events(calendar, google_credentials, credentials_by_id[google_credentials.id], semaphore)
+                for google_credentials in credentials_list
+            ], return_exceptions=True),
+            transkriptor.get_history(),
+            return_exceptions=True
+        )
+
+def sync_all_google_calendars(accounts=None):
+    """
+    Function to sync every connected account (or the 'accounts' queryset) from a single worker.
+
+    All calendar listings (and the Transkriptor history) are in flight together, bounded by
+    CALENDAR_SYNC_CONCURRENCY, then the results are written through the same bulk upsert as
+    the per-account task, CALENDAR_SYNC_WRITE_BATCH accounts at a time with their sync tokens.
+    Each account is synced under the same calendar-sync:<id> lock as the per-account task;
+    accounts a notification-triggered sync is already working on are skipped.
+    Returns the history, or None when it could not be fetched.
+    """
+    credentials_list = []
+    credentials_by_id = {}
+    locks = {}
+    try:
+        for google_credentials in (accounts if accounts is not None else GoogleCredentials.objects.all()):
+            lock = acquire_lock(f"calendar-sync:{google_credentials.id}", settings.CALENDAR_SYNC_DISPATCH_TIMEOUT)
+            if not lock:
+                print(f"Calendar sync for credentials {google_credentials.id} is still running, skipping")
+                continue
+            locks[google_credentials.id] = lock
+            try:
+                credentials_by_id[google_credentials.id] = get_credentials(google_credentials)
+            except RefreshError as e:
+                print(f"Could not refresh the token of {google_credentials.email}: {e}")
+                continue
+            credentials_list.append(google_credentials)
+
+        history = sync_locked_accounts(credentials_list, credentials_by_id)
+    finally:
+        for credentials_id, lock in locks.items():
+            release_lock(f"calendar-sync:{credentials_id}", lock)
+            # A change notified while the fleet sync held the account gets a sync of its own
+            if cache.delete(sync_dirty_key(credentials_id)):
+                request_account_sync(credentials_id)
+    return history
+
+def sync_locked_accounts(credentials_list, credentials_by_id):
+    """
+    Function to fetch and write back the accounts sync_all_google_calendars holds the locks of.
+    The events of CALENDAR_SYNC_WRITE_BATCH accounts are written in one upsert, then their sync tokens.
+    """
+    results, history = asyncio.run(fetch_fleet(credentials_list, credentials_by_id))
+
+    fetched = []
+    for google_credentials, result in zip(credentials_list, results):
+        if isinstance(result, BaseException):
+            print(f"Error updating events for credentials {google_credentials.id}: {result!r}")
+            continue
+        save_credentials(google_credentials, credentials_by_id[google_credentials.id])
+        fetched.append((google_credentials, result))
+
+    batch_size = settings.CALENDAR_SYNC_WRITE_BATCH
+    for first in range(0, len(fetched), batch_size):
+        batch = fetched[first:first + batch_size]
+        try:
+            upsert_account_events([(google_credentials, events) for google_credentials, (events, _) in batch])
+        except Exception as e:
+            # The batch keeps its old sync tokens, so the next tick fetches the same changes again
+            print(f"Error saving events for credentials {[google_credentials.id for google_credentials, _ in batch]}: {e}")
+            continue
+        print(f"Event numbers {sum(len(events) for _, (events, _) in batch)}")
+
+        # Saved once the events are written; the upsert is idempotent if this fails and the changes come again
+        for google_credentials, (_, next_sync_token) in batch:
+            google_credentials.sync_token = next_sync_token
+            google_credentials.last_synced_at = timezone.now()
+        GoogleCredentials.objects.bulk_update(
+            [google_credentials for google_credentials, _ in batch], ['sync_token', 'last_synced_at']
+        )
+
+    if isinstance(history, BaseException):
+        print(f"Failed to fetch the Transkriptor history: {history!r}")
+        return None
+    return history
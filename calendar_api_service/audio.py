@@ -0,0 +1,102 @@
+# audio.py
+import json, subprocess, tempfile, time
+
+import requests
+from django.conf import settings
+from pydub.utils import which
+
+from .transcripts import TRANSCRIPT_END_KEYS, segment_time
+from .transkriptor import get_client
+
+
+def transcript_duration(content):
+    """
+    Function to take the duration in seconds from the last transcript timestamp, if there are any.
+    """
+    end_times = [segment_time(chat, TRANSCRIPT_END_KEYS) for chat in content or []]
+    end_times = [end_time for end_time in end_times if end_time is not None]
+    if not end_times:
+        return None
+    return int(max(end_times) / 1000.0)
+
+def probe_duration(url):
+    """
+    Function to read the duration from the container headers with ffprobe.
+    ffprobe fetches the URL itself with ranged reads, so the recording is never downloaded in full.
+    """
+    ffprobe = which("ffprobe")
+    if not ffprobe:
+        return None
+
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', url],
+            capture_output=True,
+            timeout=settings.AUDIO_PROBE_TIMEOUT,
+            check=True
+        )
+        duration = json.loads(result.stdout)['format']['duration']
+        return int(float(duration))
+    except (subprocess.SubprocessError, ValueError, KeyError) as e:
+        print(f"ffprobe could not read the duration of {url}: {e}")
+        return None
+
+def decode_duration(url):
+    """
+    Function to download the recording to a temporary file, bounded by AUDIO_PROBE_MAX_BYTES and
+    AUDIO_PROBE_TIMEOUT, and measure it by decoding it with ffmpeg, also bounded by AUDIO_PROBE_TIMEOUT.
+    ffmpeg streams the decoded audio to a null sink, so it never sits in memory.
+    """
+    ffmpeg = which("ffmpeg")
+    if not ffmpeg:
+        return None
+
+    deadline = time.monotonic() + settings.AUDIO_PROBE_TIMEOUT
+    with get_client().download(url, timeout=settings.AUDIO_PROBE_TIMEOUT) as response:
+        response.raise_for_status()
+        with tempfile.NamedTemporaryFile() as audio_file:
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > settings.AUDIO_PROBE_MAX_BYTES:
+                    raise ValueError(f"Recording is larger than {settings.AUDIO_PROBE_MAX_BYTES} bytes")
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Timed out downloading the recording")
+                audio_file.write(chunk)
+            audio_file.flush()
+
+            result = subprocess.run(
+                [ffmpeg, '-nostdin', '-v', 'error', '-i', audio_file.name, '-vn', '-f', 'null', '-', '-progress', 'pipe:1'],
+                capture_output=True,
+                timeout=settings.AUDIO_PROBE_TIMEOUT,
+                check=True
+            )
+
+    # The last progress report carries the decoded length; out_time_ms is in microseconds despite its name
+    out_times = [
+        line.split('=', 1)[1] for line in result.stdout.decode().splitlines()
+        if line.startswith('out_time_ms=')
+    ]
+    if not out_times or not out_times[-1].isdigit():
+        return None
+    return int(int(out_times[-1]) / 1000000.0)
+
+def get_audio_duration(url, content=None):
+    """
+    Function to get a meeting's duration in seconds: from the transcript timestamps when present,
+    else from the recording headers, decoding the recording only as a last resort.
+    """
+    duration = transcript_duration(content)
+    if duration is not None:
+        return duration
+
+    duration = probe_duration(url)
+    if duration is not None:
+        return duration
+
+    try:
+        return decode_duration(url)
+    except requests.exceptions.RequestException as e:
+        print(f"HTTP request failed: {e}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
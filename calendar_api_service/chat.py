@@ -1,54 +1,227 @@
-import asyncio
+import asyncio, hashlib, json
 import openai
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import cache
+
+from .models import OpenAIAssistant
+from .search import retrieve_context
 
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+
+ASSISTANT_NAME = "Google Meeting AI Chatbot"
+ASSISTANT_MODEL = "gpt-4-turbo-preview"
+ASSISTANT_INSTRUCTIONS = (
+    "Act as a highly capable virtual assistant specifically designed for Google Meetings, "
+    "where your primary responsibility is to assist users by providing comprehensive insights "
+    "derived from meeting transcriptions, which include critical elements such as the identification "
+    "of speaker names, the summarization of key discussion points, and the extraction of actionable "
+    "items that arise during the meeting; you should accurately summarize the content discussed, "
+    "ensuring that important information is highlighted and easily accessible, while also being "
+    "prepared to answer any questions related to the discussions that took place during the meeting, "
+    "utilizing the transcription data to generate concise yet informative summaries and detailed "
+    "explanations when users seek clarification on specific topics discussed; throughout this process, "
+    "it is essential to prioritize user engagement and maintain a smooth conversational flow, ensuring "
+    "that users feel supported and informed in navigating the complexities of their meetings."
+)
+ASSISTANT_TOOLS = [
+    {"type": "file_search"},
+    {"type": "code_interpreter"}
+]
+
+# Assistant stream events that end a run, mapped to the run status reported to the client
+TERMINAL_RUN_EVENTS = {
+    'thread.run.completed': 'completed',
+    'thread.run.failed': 'failed',
+    'thread.run.cancelled': 'cancelled',
+    'thread.run.expired': 'expired',
+    'thread.run.incomplete': 'incomplete',
+}
+
+_assistant_ids = {}
+
+def instructions_hash(instructions):
+    return hashlib.sha256(instructions.encode()).hexdigest()
+
+def get_assistant_id(model=ASSISTANT_MODEL, instructions=ASSISTANT_INSTRUCTIONS):
+    """
+    Function to return the id of the shared assistant for (model, instructions), creating it only once.
+
+    Lookups go through a process-level dict, then the shared cache, then the
+    OpenAIAssistant table; the assistant is only created on the provider when
+    none of them knows it.
+    """
+    key = (model, instructions_hash(instructions))
+    assistant_id = _assistant_ids.get(key)
+    if assistant_id:
+        return assistant_id
+
+    cache_key = f"openai-assistant:{key[0]}:{key[1]}"
+    assistant_id = cache.get(cache_key)
+    if not assistant_id:
+        registered = OpenAIAssistant.objects.filter(model=key[0], instructions_hash=key[1]).first()
+        if registered is None:
+            assistant = client.beta.assistants.create(
+                name=ASSISTANT_NAME,
+                instructions=instructions,
+                tools=ASSISTANT_TOOLS,
+                model=model,
+            )
+            registered, created = OpenAIAssistant.objects.get_or_create(
+                model=key[0],
+                instructions_hash=key[1],
+                defaults={'assistant_id': assistant.id}
+            )
+            # Another worker registered one first, drop ours so it does not leak
+            if not created:
+                client.beta.assistants.delete(assistant.id)
+        assistant_id = registered.assistant_id
+        cache.set(cache_key, assistant_id, timeout=None)
+
+    _assistant_ids[key] = assistant_id
+    return assistant_id
+
+def build_user_message(query, vector_store_id):
+    """
+    Function to prefix the question with the best matching lines of the locally indexed transcript, if any.
+    """
+    excerpts = retrieve_context(query, vector_store_id)
+    if not excerpts:
+        return query
+    return "Relevant transcript excerpts:\n" + "\n".join(excerpts) + "\n\nQuestion: " + query
+
+class AssistantRunError(Exception):
+    """
+    Raised when an assistant run ends without completing or does not finish in time.
+    """
 
 async def get_openai_assistant_response(query, vector_store_id):
+    """
+    Function to run the assistant on a question and return its answer once the run completes.
+    Runs ending failed, cancelled, expired, incomplete or waiting on a tool call raise
+    AssistantRunError, as do runs still going after CHATBOT_STREAM_TIMEOUT, which are cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.CHATBOT_STREAM_TIMEOUT
     try:
-        assistant = client.beta.assistants.create(
-            name="Google Meeting AI Chatbot",
-            instructions=(
-                "Act as a highly capable virtual assistant specifically designed for Google Meetings, "
-                "where your primary responsibility is to assist users by providing comprehensive insights "
-                "derived from meeting transcriptions, which include critical elements such as the identification "
-                "of speaker names, the summarization of key discussion points, and the extraction of actionable "
-                "items that arise during the meeting; you should accurately summarize the content discussed, "
-                "ensuring that important information is highlighted and easily accessible, while also being "
-                "prepared to answer any questions related to the discussions that took place during the meeting, "
-                "utilizing the transcription data to generate concise yet informative summaries and detailed "
-                "explanations when users seek clarification on specific topics discussed; throughout this process, "
-                "it is essential to prioritize user engagement and maintain a smooth conversational flow, ensuring "
-                "that users feel supported and informed in navigating the complexities of their meetings."
-            ),
-            tools=[
-                {"type": "file_search"},
-                {"type": "code_interpreter"}
-            ],
-            tool_resources={"file_search": {"vector_store_ids": [vector_store_id]}},
-            model="gpt-4-turbo-preview",
-        )
+        assistant_id = await sync_to_async(get_assistant_id)()
 
-        thread = client.beta.threads.create()
+        # The meeting's vector store is attached to the thread so the assistant itself stays shared
+        thread = client.beta.threads.create(
+            tool_resources={"file_search": {"vector_store_ids": [vector_store_id]}}
+        )
         client.beta.threads.messages.create(
             thread_id=thread.id,
             role="user",
-            content=query
+            content=await sync_to_async(build_user_message)(query, vector_store_id)
         )
-        run = client.beta.threads.runs.create(thread_id=thread.id, assistant_id=assistant.id)
+        run = client.beta.threads.runs.create(thread_id=thread.id, assistant_id=assistant_id)
 
-        while run.status != "completed":
+        while run.status in ("queued", "in_progress", "cancelling"):
+            if loop.time() >= deadline:
+                if run.status != "cancelling":
+                    client.beta.threads.runs.cancel(thread_id=thread.id, run_id=run.id)
+                raise AssistantRunError(f"Run {run.id} did not finish in time")
             await asyncio.sleep(1)
             run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
 
+        if run.status != "completed":
+            if run.status == "requires_action":
+                # No function tools are registered, so nothing could ever submit the outputs
+                client.beta.threads.runs.cancel(thread_id=thread.id, run_id=run.id)
+            last_error = run.last_error.message if run.last_error else None
+            raise AssistantRunError(f"Run {run.id} ended {run.status}: {last_error}")
+
         messages = client.beta.threads.messages.list(thread_id=thread.id)
         openai_response = messages.data[0].content[0].text.value if messages.data else "No response"
 
         return openai_response
     except openai.APIError as openai_error:
-        print(f"OpenAI API error: {openai_error}", exc_info=True)
+        print(f"OpenAI API error: {openai_error}")
         raise
     except Exception as e:
-        print(f"General error while getting OpenAI response: {e}", exc_info=True)
+        print(f"General error while getting OpenAI response: {e}")
         raise
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_openai_assistant_response(query, vector_store_id, on_complete=None):
+    """
+    Async generator streaming the assistant's answer as Server-Sent Events.
+
+    Emits 'token' events as text deltas arrive and ends with a 'done' event, or an
+    'error' event for failed, cancelled, expired or timed out runs. A run that does not
+    reach a terminal state, because of the timeout or because the client disconnected
+    and the response was cancelled, is cancelled on the provider. 'on_complete' is awaited
+    with the full answer text once the run completes.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.CHATBOT_STREAM_TIMEOUT
+
+    assistant_id = await sync_to_async(get_assistant_id)()
+    thread = await async_client.beta.threads.create(
+        tool_resources={"file_search": {"vector_store_ids": [vector_store_id]}}
+    )
+    await async_client.beta.threads.messages.create(
+        thread_id=thread.id,
+        role="user",
+        content=await sync_to_async(build_user_message)(query, vector_store_id)
+    )
+    stream = await async_client.beta.threads.runs.create(thread_id=thread.id, assistant_id=assistant_id, stream=True)
+
+    run_id = None
+    finished = False
+    answer = []
+    events = stream.__aiter__()
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                event = await asyncio.wait_for(events.__anext__(), remaining)
+            except StopAsyncIteration:
+                break
+
+            if event.event == 'thread.run.created':
+                run_id = event.data.id
+            elif event.event == 'thread.message.delta':
+                for part in event.data.delta.content or []:
+                    if part.type == 'text' and part.text and part.text.value:
+                        answer.append(part.text.value)
+                        yield sse_event('token', {'text': part.text.value})
+            elif event.event in TERMINAL_RUN_EVENTS:
+                finished = True
+                run_status = TERMINAL_RUN_EVENTS[event.event]
+                if run_status == 'completed':
+                    if on_complete is not None:
+                        await on_complete(''.join(answer))
+                    yield sse_event('done', {'status': run_status})
+                else:
+                    last_error = event.data.last_error.message if event.data.last_error else None
+                    yield sse_event('error', {'status': run_status, 'message': last_error})
+                break
+            elif event.event == 'error':
+                finished = True
+                yield sse_event('error', {'status': 'failed', 'message': str(event.data)})
+                break
+
+        if not finished:
+            yield sse_event('error', {'status': 'failed', 'message': 'Run ended without a final status'})
+
+    except asyncio.TimeoutError:
+        yield sse_event('error', {'status': 'timeout', 'message': 'The assistant did not finish in time'})
+    except openai.APIError as openai_error:
+        print(f"OpenAI API error: {openai_error}")
+        yield sse_event('error', {'status': 'failed', 'message': str(openai_error)})
+    finally:
+        if not finished and run_id:
+            try:
+                await async_client.beta.threads.runs.cancel(thread_id=thread.id, run_id=run_id)
+            except openai.APIError as openai_error:
+                print(f"Failed to cancel run {run_id}: {openai_error}")
+        await stream.close()
@@ -0,0 +1,122 @@
+# credentials.py
+from datetime import timedelta, timezone as dt_timezone
+
+import google.oauth2.credentials
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+
+from .models import GoogleCredentials
+
+
+def credentials_from_model(google_credentials):
+    """
+    Function to build google-auth credentials from a stored GoogleCredentials row.
+    """
+    expiry = google_credentials.token_expiry
+    return google.oauth2.credentials.Credentials(
+        token=google_credentials.token,
+        refresh_token=google_credentials.refresh_token,
+        token_uri=google_credentials.token_uri,
+        client_id=google_credentials.client_id,
+        client_secret=google_credentials.client_secret,
+        scopes=google_credentials.scopes.split(','),
+        # google-auth compares expiries as naive UTC datetimes
+        expiry=timezone.make_naive(expiry, dt_timezone.utc) if expiry else None
+    )
+
+def apply_credentials(google_credentials, credentials):
+    """
+    Function to copy a refreshed token onto the row. Returns whether anything changed.
+    A new token also clears a recorded refresh failure.
+    """
+    expiry = timezone.make_aware(credentials.expiry, dt_timezone.utc) if credentials.expiry else None
+    refresh_token = credentials.refresh_token or google_credentials.refresh_token
+    if (google_credentials.token, google_credentials.token_expiry, google_credentials.refresh_token) == (
+        credentials.token, expiry, refresh_token
+    ):
+        return False
+    google_credentials.token = credentials.token
+    google_credentials.token_expiry = expiry
+    google_credentials.refresh_token = refresh_token
+    google_credentials.refresh_failed_at = None
+    return True
+
+def save_credentials(google_credentials, credentials):
+    """
+    Function to persist the token google-auth refreshed during a call, if it did.
+    """
+    if apply_credentials(google_credentials, credentials):
+        GoogleCredentials.objects.filter(id=google_credentials.id).update(
+            token=google_credentials.token,
+            token_expiry=google_credentials.token_expiry,
+            refresh_token=google_credentials.refresh_token,
+            refresh_failed_at=None
+        )
+
+def needs_refresh(google_credentials, ahead=None):
+    """
+    Function to tell whether the stored access token expires within 'ahead' seconds.
+    Rows saved before expiries were tracked are refreshed once to learn theirs.
+    """
+    ahead = settings.GOOGLE_TOKEN_REFRESH_AHEAD if ahead is None else ahead
+    if google_credentials.token_expiry is None:
+        return True
+    return google_credentials.token_expiry <= timezone.now() + timedelta(seconds=ahead)
+
+def get_credentials(google_credentials):
+    """
+    Function to return ready-to-use credentials for a row, refreshing and persisting the
+    token first only when the proactive refresh has not kept it ahead of expiry.
+    """
+    credentials = credentials_from_model(google_credentials)
+    if needs_refresh(google_credentials, ahead=settings.GOOGLE_TOKEN_REFRESH_MARGIN):
+        try:
+            credentials.refresh(Request())
+        except RefreshError as e:
+            record_refresh_failure(google_credentials, e)
+            raise
+        save_credentials(google_credentials, credentials)
+    return credentials
+
+def record_refresh_failure(google_credentials, error):
+    """
+    Function to flag a row whose refresh token Google refused, so the proactive refresh skips it.
+    Errors Google marks as retryable are left for the next attempt.
+    """
+    if getattr(error, 'retryable', False):
+        return False
+    google_credentials.refresh_failed_at = timezone.now()
+    GoogleCredentials.objects.filter(id=google_credentials.id).update(refresh_failed_at=google_credentials.refresh_failed_at)
+    return True
+
+def refresh_expiring_credentials():
+    """
+    Function to refresh, in one batch, the tokens expiring within GOOGLE_TOKEN_REFRESH_AHEAD,
+    unknown expiries and soonest first, and save them with a single bulk update. Rows whose
+    refresh token was refused are skipped until the account is connected again, so they
+    cannot fill every batch. Returns the number refreshed.
+    """
+    deadline = timezone.now() + timedelta(seconds=settings.GOOGLE_TOKEN_REFRESH_AHEAD)
+    expiring = GoogleCredentials.objects.filter(
+        Q(token_expiry__isnull=True) | Q(token_expiry__lte=deadline),
+        refresh_failed_at__isnull=True
+    ).order_by(F('token_expiry').asc(nulls_first=True))[:settings.GOOGLE_TOKEN_REFRESH_BATCH_SIZE]
+
+    refreshed = []
+    request = Request()
+    for google_credentials in expiring:
+        credentials = credentials_from_model(google_credentials)
+        try:
+            credentials.refresh(request)
+        except RefreshError as e:
+            print(f"Could not refresh the token of {google_credentials.email}: {e}")
+            record_refresh_failure(google_credentials, e)
+            continue
+        if apply_credentials(google_credentials, credentials):
+            refreshed.append(google_credentials)
+
+    GoogleCredentials.objects.bulk_update(refreshed, ['token', 'token_expiry', 'refresh_token', 'refresh_failed_at'])
+    return len(refreshed)
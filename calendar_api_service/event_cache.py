@@ -0,0 +1,57 @@
+# event_cache.py
+import hashlib, json
+
+from django.conf import settings
+from django.core.cache import cache
+
+def _version_key(scope):
+    return f"event-list-version:{scope}"
+
+def get_event_list_version(user_id):
+    """
+    Function to return the current version of a user's event lists.
+    It changes whenever one of the events the user owns is written.
+    """
+    return str(cache.get(_version_key(user_id), 0))
+
+def bump_event_list_versions(user_ids=()):
+    """
+    Function to invalidate the cached event lists of the given users.
+    """
+    for scope in set(user_ids):
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            # incr fails on a missing key; start the counter past the implicit 0
+            if not cache.add(_version_key(scope), 1, timeout=None):
+                cache.incr(_version_key(scope))
+
+def event_list_etag(user_id, event_status, query_params):
+    """
+    Function to build the strong ETag of one event list page from the list version and the query.
+    """
+    version = get_event_list_version(user_id)
+    query = '&'.join(f"{key}={value}" for key, value in sorted(query_params.items()))
+    digest = hashlib.sha256(f"{user_id}|{event_status}|{version}|{query}".encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+def content_etag(data):
+    """
+    Function to build a weak ETag from a page's data, for pages read from the replica: the list
+    version comes from the primary and may be ahead of what the lagging replica returned.
+    """
+    digest = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+def get_cached_page(etag):
+    """
+    Function to return the (data, response ETag) cached for a list ETag, or None.
+    """
+    return cache.get(f"event-list-response:{etag}")
+
+def set_cached_page(etag, data, timeout=None, response_etag=None):
+    cache.set(
+        f"event-list-response:{etag}",
+        (data, response_etag or etag),
+        timeout if timeout is not None else settings.EVENT_LIST_CACHE_TTL
+    )
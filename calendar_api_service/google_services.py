@@ -0,0 +1,50 @@
+# google_services.py
+import json
+import threading
+from functools import lru_cache
+
+import httplib2
+from django.conf import settings
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+_transports = threading.local()
+
+
+@lru_cache(maxsize=None)
+def get_discovery_document(service_name, version):
+    """
+    Function to load and parse a discovery document bundled with googleapiclient, once per process.
+    """
+    document = get_static_doc(service_name, version)
+    if document is None:
+        raise ValueError(f"No static discovery document for {service_name} {version}")
+    return json.loads(document)
+
+def get_transport():
+    """
+    Function to return this thread's keep-alive httplib2 transport.
+    httplib2.Http is not thread safe, so each worker thread gets its own pooled instance.
+    """
+    transport = getattr(_transports, 'http', None)
+    if transport is None:
+        transport = httplib2.Http(timeout=settings.GOOGLE_API_TIMEOUT)
+        _transports.http = transport
+    return transport
+
+def build_service(service_name, version, credentials):
+    """
+    Function to build an API client from the cached discovery document,
+    attaching only the per-credential auth to the shared transport.
+    """
+    return build_from_document(
+        get_discovery_document(service_name, version),
+        http=AuthorizedHttp(credentials, http=get_transport())
+    )
+
+def calendar_service(credentials):
+    return build_service('calendar', 'v3', credentials)
+
+def oauth2_service(credentials):
+    return build_service('oauth2', 'v2', credentials)
@@ -0,0 +1,57 @@
+# send_calendar_notification.py
+import uuid
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from calendar_api_service.models import CalendarWatchChannel, GoogleCredentials
+
+
+class Command(BaseCommand):
+    help = "Send a fake Google Calendar push notification for an account's watch channel to the webhook."
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Email of the connected Google account")
+        parser.add_argument('--state', default='exists', choices=['sync', 'exists', 'not_exists'])
+        parser.add_argument('--url', help="Webhook URL, defaults to GOOGLE_CALENDAR_WEBHOOK_URL")
+        parser.add_argument('--create', action='store_true', help="Create a local channel if the account has none")
+
+    def handle(self, *args, **options):
+        url = options['url'] or settings.GOOGLE_CALENDAR_WEBHOOK_URL
+        if not url:
+            raise CommandError("Pass --url or set GOOGLE_CALENDAR_WEBHOOK_URL")
+
+        channel = CalendarWatchChannel.objects.filter(
+            google_credentials__email=options['email']
+        ).order_by('-expiration').first()
+        if channel is None:
+            if not options['create']:
+                raise CommandError(f"No watch channel for {options['email']}, pass --create to add a local one")
+            channel = self.create_local_channel(options['email'])
+
+        response = requests.post(url, headers={
+            'X-Goog-Channel-ID': channel.channel_id,
+            'X-Goog-Channel-Token': channel.token,
+            'X-Goog-Resource-ID': channel.resource_id,
+            'X-Goog-Resource-State': options['state'],
+            'X-Goog-Message-Number': '1',
+        }, timeout=10)
+        self.stdout.write(f"{response.status_code} {response.text}")
+
+    def create_local_channel(self, email):
+        """
+        Function to add a channel that only exists locally, for setups without a public webhook.
+        """
+        google_credentials = GoogleCredentials.objects.filter(email=email).first()
+        if google_credentials is None:
+            raise CommandError(f"No connected Google account {email}")
+        return CalendarWatchChannel.objects.create(
+            google_credentials=google_credentials,
+            channel_id=uuid.uuid4().hex,
+            resource_id='local',
+            token=uuid.uuid4().hex,
+            expiration=timezone.now() + timedelta(seconds=settings.GOOGLE_CALENDAR_WATCH_TTL)
+        )
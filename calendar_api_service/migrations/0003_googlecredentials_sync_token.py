@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0002_alter_googlecredentials_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='googlecredentials',
+            name='last_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='googlecredentials',
+            name='sync_token',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+    ]
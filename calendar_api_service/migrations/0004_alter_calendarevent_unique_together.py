@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:40
+
+from django.db import migrations
+
+
+def remove_duplicate_events(apps, schema_editor):
+    """
+    Keep the oldest row of every (google_credentials, event_id) pair so the constraint can be added.
+    Rows pointing at a removed duplicate are repointed to the kept row first, so no reference is lost.
+    """
+    CalendarEvent = apps.get_model('calendar_api_service', 'CalendarEvent')
+    kept_ids = {}
+    kept_by_duplicate = {}
+    for event in CalendarEvent.objects.filter(event_id__isnull=False).order_by('id').only('id', 'google_credentials_id', 'event_id'):
+        key = (event.google_credentials_id, event.event_id)
+        if key in kept_ids:
+            kept_by_duplicate[event.id] = kept_ids[key]
+        else:
+            kept_ids[key] = event.id
+
+    for relation in CalendarEvent._meta.related_objects:
+        if not relation.many_to_one and not relation.one_to_one:
+            continue
+        for duplicate_id, kept_id in kept_by_duplicate.items():
+            relation.related_model._base_manager.filter(
+                **{relation.field.attname: duplicate_id}
+            ).update(**{relation.field.attname: kept_id})
+    CalendarEvent.objects.filter(id__in=kept_by_duplicate.keys()).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0003_googlecredentials_sync_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_events, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='calendarevent',
+            unique_together={('google_credentials', 'event_id')},
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0004_alter_calendarevent_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarevent',
+            name='bot_dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='bot_scheduled_for',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='calendarevent',
+            name='bot_task_id',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+    ]
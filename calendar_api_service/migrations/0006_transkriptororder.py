@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0005_calendarevent_bot_schedule'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='calendarevent',
+            name='conference_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='calendarevent',
+            name='hangout_link',
+            field=models.URLField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TranskriptorOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(unique=True)),
+                ('meeting_url', models.URLField(blank=True, null=True)),
+                ('conference_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed')], db_index=True, default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('calendar_event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transkriptor_orders', to='calendar_api_service.calendarevent')),
+            ],
+        ),
+    ]
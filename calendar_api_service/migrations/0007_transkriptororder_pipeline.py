@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0006_transkriptororder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transkriptororder',
+            name='duration',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='transkriptororder',
+            name='sound_url',
+            field=models.URLField(blank=True, max_length=1000, null=True),
+        ),
+        migrations.AddField(
+            model_name='transkriptororder',
+            name='vector_store_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transkriptororder',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed')], db_index=True, default='pending', max_length=10),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0007_transkriptororder_pipeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenAIAssistant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('instructions_hash', models.CharField(max_length=64)),
+                ('assistant_id', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('model', 'instructions_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0008_openaiassistant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['status', 'start_time', 'id'], name='event_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['google_credentials', 'status', 'start_time'], name='event_account_status_start_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0009_calendarevent_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transcript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sound_url', models.URLField(blank=True, max_length=1000, null=True)),
+                ('speakers', models.JSONField(default=list)),
+                ('segment_count', models.IntegerField(default=0)),
+                ('duration_ms', models.BigIntegerField(null=True)),
+                ('extra', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('calendar_event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transcripts', to='calendar_api_service.calendarevent')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='transcript', to='calendar_api_service.transkriptororder')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TranscriptSegmentBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_segment', models.IntegerField()),
+                ('segment_count', models.IntegerField()),
+                ('start_ms', models.BigIntegerField(null=True)),
+                ('end_ms', models.BigIntegerField(null=True)),
+                ('data', models.BinaryField()),
+                ('transcript', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='calendar_api_service.transcript')),
+            ],
+            options={
+                'unique_together': {('transcript', 'first_segment')},
+                'indexes': [models.Index(fields=['transcript', 'start_ms'], name='transcript_block_start_idx')],
+            },
+        ),
+    ]
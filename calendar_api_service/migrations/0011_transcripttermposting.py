@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0010_transcript'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcript',
+            name='indexed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='token_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TranscriptTermPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('segment_index', models.IntegerField()),
+                ('speaker', models.CharField(blank=True, max_length=255, null=True)),
+                ('start_ms', models.BigIntegerField(null=True)),
+                ('term_frequency', models.IntegerField()),
+                ('segment_length', models.IntegerField()),
+                ('positions', models.JSONField(default=list)),
+                ('transcript', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='calendar_api_service.transcript')),
+            ],
+            options={
+                'unique_together': {('term', 'transcript', 'segment_index')},
+            },
+        ),
+    ]
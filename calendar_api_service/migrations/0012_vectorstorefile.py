@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0011_transcripttermposting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transkriptororder',
+            name='indexing_requested_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='VectorStoreFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('backend', models.CharField(max_length=50)),
+                ('file_id', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('content_hash', 'backend')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0012_vectorstorefile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='googlecredentials',
+            name='token_expiry',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
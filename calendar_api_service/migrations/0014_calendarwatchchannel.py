@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0013_googlecredentials_token_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarWatchChannel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel_id', models.CharField(max_length=64, unique=True)),
+                ('resource_id', models.CharField(max_length=255)),
+                ('token', models.CharField(max_length=64)),
+                ('expiration', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('google_credentials', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watch_channels', to='calendar_api_service.googlecredentials')),
+            ],
+        ),
+    ]
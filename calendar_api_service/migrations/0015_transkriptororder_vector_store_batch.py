@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0014_calendarwatchchannel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transkriptororder',
+            name='vector_store_batch_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='transkriptororder',
+            name='indexed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
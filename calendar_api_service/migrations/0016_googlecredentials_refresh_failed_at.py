@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0015_transkriptororder_vector_store_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='googlecredentials',
+            name='refresh_failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
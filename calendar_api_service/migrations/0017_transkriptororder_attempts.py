@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0016_googlecredentials_refresh_failed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transkriptororder',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='transkriptororder',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10),
+        ),
+    ]
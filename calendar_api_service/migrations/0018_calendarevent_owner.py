@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-19 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_event_owners(apps, schema_editor):
+    """
+    Synced events belong to their account's user. Manual events never recorded who added
+    them, so they stay without an owner and are no longer listed for every user.
+    """
+    CalendarEvent = apps.get_model('calendar_api_service', 'CalendarEvent')
+    GoogleCredentials = apps.get_model('calendar_api_service', 'GoogleCredentials')
+    CalendarEvent.objects.filter(google_credentials__isnull=False).update(
+        owner=Subquery(GoogleCredentials.objects.filter(id=OuterRef('google_credentials')).values('user')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0017_transkriptororder_attempts'),
+        ('authentication', '0003_teamcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarevent',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='calendar_events', to='authentication.customuser'),
+        ),
+        migrations.RunPython(set_event_owners, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='calendarevent',
+            index=models.Index(fields=['owner', 'status', 'start_time', 'id'], name='event_owner_status_start_idx'),
+        ),
+    ]
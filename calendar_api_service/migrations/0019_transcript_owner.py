@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-19 09:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_transcript_owners(apps, schema_editor):
+    """
+    Transcripts belong to the owner of their meeting's event; unmatched ones get no owner and are searchable by nobody.
+    """
+    Transcript = apps.get_model('calendar_api_service', 'Transcript')
+    CalendarEvent = apps.get_model('calendar_api_service', 'CalendarEvent')
+    Transcript.objects.filter(calendar_event__isnull=False).update(
+        owner=Subquery(CalendarEvent.objects.filter(id=OuterRef('calendar_event')).values('owner')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0018_calendarevent_owner'),
+        ('authentication', '0003_teamcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcript',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transcripts', to='authentication.customuser'),
+        ),
+        migrations.RunPython(set_transcript_owners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-19 11:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0019_transcript_owner'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='transkriptororder',
+            name='vector_store_batch_id',
+        ),
+    ]
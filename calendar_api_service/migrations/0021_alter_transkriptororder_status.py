@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+def set_aside_orders_without_url(apps, schema_editor):
+    """
+    Pending orders without a meeting URL used to be paired with events by position; they now wait for manual review.
+    """
+    TranskriptorOrder = apps.get_model('calendar_api_service', 'TranskriptorOrder')
+    TranskriptorOrder.objects.filter(status='pending', calendar_event__isnull=True, meeting_url__isnull=True).update(
+        status='unmatched'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calendar_api_service', '0020_remove_transkriptororder_vector_store_batch_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transkriptororder',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed'), ('unmatched', 'Unmatched')], db_index=True, default='pending', max_length=10),
+        ),
+        migrations.RunPython(set_aside_orders_without_url, migrations.RunPython.noop),
+    ]
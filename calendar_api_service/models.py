@@ -7,11 +7,16 @@ class GoogleCredentials(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     email = models.EmailField()
     token = models.CharField(max_length=500)
+    token_expiry = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Set when Google refused to refresh the token; the account needs to be connected again
+    refresh_failed_at = models.DateTimeField(null=True, blank=True)
     refresh_token = models.CharField(max_length=500)
     token_uri = models.CharField(max_length=500)
     client_id = models.CharField(max_length=500)
     client_secret = models.CharField(max_length=500)
     scopes = models.TextField()
+    sync_token = models.CharField(max_length=500, null=True, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
 
 class CalendarEvent(models.Model):
     STATUS_CHOICES = [
@@ -28,6 +33,8 @@ class CalendarEvent(models.Model):
         blank=True  # Allow it to be blank when manually adding events
     )
     event_id = models.CharField(max_length=500, blank=True, null=True)  # Make it optional
+    # User the event is listed for: the account's user for synced events, the creator for manual ones
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='calendar_events', null=True, blank=True)
     summary = models.CharField(max_length=500)
     description = models.TextField(null=True, blank=True)
     location = models.CharField(max_length=500, null=True, blank=True)
@@ -35,16 +42,153 @@ class CalendarEvent(models.Model):
     end_time = models.DateTimeField()
     organizer_email = models.EmailField(blank=True, null=True)  # Make it optional
     creator_email = models.EmailField(blank=True, null=True)    # Make it optional
-    hangout_link = models.URLField(null=True, blank=True)
-    conference_id = models.CharField(max_length=100, null=True, blank=True)
+    hangout_link = models.URLField(null=True, blank=True, db_index=True)
+    conference_id = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     conference_solution_name = models.CharField(max_length=100, null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
     orderId = models.CharField(max_length=50, null=True, blank=True)
     duration = models.IntegerField(null=True)
     vectorStoreId = models.CharField(max_length=100, null=True, blank=True)
+    bot_task_id = models.CharField(max_length=50, null=True, blank=True)
+    bot_scheduled_for = models.DateTimeField(null=True, blank=True)
+    bot_dispatched_at = models.DateTimeField(null=True, blank=True)
 
-    # class Meta:
-    #     unique_together = ('google_credentials', 'event_id')
+    class Meta:
+        unique_together = ('google_credentials', 'event_id')
+        indexes = [
+            models.Index(fields=['status', 'start_time', 'id'], name='event_status_start_idx'),
+            models.Index(fields=['google_credentials', 'status', 'start_time'], name='event_account_status_start_idx'),
+            models.Index(fields=['owner', 'status', 'start_time', 'id'], name='event_owner_status_start_idx'),
+        ]
 
     def __str__(self):
         return self.summary
+
+class TranskriptorOrder(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+        # No meeting URL, or no event matched it in time; left for manual review
+        ('unmatched', 'Unmatched'),
+    ]
+
+    order_id = models.BigIntegerField(unique=True)
+    meeting_url = models.URLField(null=True, blank=True)
+    conference_id = models.CharField(max_length=100, null=True, blank=True)
+    calendar_event = models.ForeignKey(
+        'CalendarEvent',
+        on_delete=models.SET_NULL,
+        related_name='transkriptor_orders',
+        null=True,
+        blank=True
+    )
+    sound_url = models.URLField(max_length=1000, null=True, blank=True)
+    duration = models.IntegerField(null=True)
+    vector_store_id = models.CharField(max_length=100, null=True, blank=True)
+    # Set once the transcript is ready for the batched vector store ingestion, see vector_stores.py
+    indexing_requested_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Set when the store is ready to answer; the order is then finished exactly once
+    indexed_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    # Pipeline runs started for the order; it is failed for good after ORDER_PIPELINE_MAX_ATTEMPTS
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.order_id)
+
+class OpenAIAssistant(models.Model):
+    model = models.CharField(max_length=100)
+    instructions_hash = models.CharField(max_length=64)
+    assistant_id = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('model', 'instructions_hash')
+
+    def __str__(self):
+        return self.assistant_id
+
+class Transcript(models.Model):
+    order = models.OneToOneField('TranskriptorOrder', on_delete=models.CASCADE, related_name='transcript')
+    # Owner of the meeting's event when the transcript was stored; only they can search it
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='transcripts', null=True, blank=True)
+    calendar_event = models.ForeignKey(
+        'CalendarEvent',
+        on_delete=models.SET_NULL,
+        related_name='transcripts',
+        null=True,
+        blank=True
+    )
+    sound_url = models.URLField(max_length=1000, null=True, blank=True)
+    # Distinct speaker names; segment blocks refer to them by index
+    speakers = models.JSONField(default=list)
+    segment_count = models.IntegerField(default=0)
+    duration_ms = models.BigIntegerField(null=True)
+    # Top-level keys of the Transkriptor payload other than 'content'
+    extra = models.JSONField(default=dict)
+    # Search index bookkeeping, see search.py
+    token_count = models.BigIntegerField(default=0)
+    indexed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.order_id)
+
+class TranscriptSegmentBlock(models.Model):
+    transcript = models.ForeignKey('Transcript', on_delete=models.CASCADE, related_name='blocks')
+    first_segment = models.IntegerField()
+    segment_count = models.IntegerField()
+    start_ms = models.BigIntegerField(null=True)
+    end_ms = models.BigIntegerField(null=True)
+    # zlib-compressed JSON object of per-field columns for the block's segments
+    data = models.BinaryField()
+
+    class Meta:
+        unique_together = ('transcript', 'first_segment')
+        indexes = [
+            models.Index(fields=['transcript', 'start_ms'], name='transcript_block_start_idx'),
+        ]
+
+class TranscriptTermPosting(models.Model):
+    term = models.CharField(max_length=100)
+    transcript = models.ForeignKey('Transcript', on_delete=models.CASCADE, related_name='postings')
+    segment_index = models.IntegerField()
+    speaker = models.CharField(max_length=255, null=True, blank=True)
+    start_ms = models.BigIntegerField(null=True)
+    term_frequency = models.IntegerField()
+    # Number of tokens in the segment, the BM25 document length
+    segment_length = models.IntegerField()
+    # Token positions of the term within the segment, used for phrase queries
+    positions = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ('term', 'transcript', 'segment_index')
+
+class VectorStoreFile(models.Model):
+    # sha256 of the file text (a group of chunks); identical files are uploaded once per backend
+    content_hash = models.CharField(max_length=64)
+    backend = models.CharField(max_length=50)
+    file_id = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('content_hash', 'backend')
+
+    def __str__(self):
+        return self.file_id
+
+class CalendarWatchChannel(models.Model):
+    google_credentials = models.ForeignKey('GoogleCredentials', on_delete=models.CASCADE, related_name='watch_channels')
+    # Our id for the channel, echoed back by Google in X-Goog-Channel-ID
+    channel_id = models.CharField(max_length=64, unique=True)
+    resource_id = models.CharField(max_length=255)
+    # Shared secret echoed back in X-Goog-Channel-Token
+    token = models.CharField(max_length=64)
+    expiration = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.channel_id
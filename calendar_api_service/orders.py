@@ -0,0 +1,118 @@
+# orders.py
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import CalendarEvent, TranskriptorOrder
+
+# Google Meet codes look like abc-defg-hij and double as the event's conferenceId
+MEET_CODE_PATTERN = re.compile(r'meet\.google\.com/([a-z]{3}-[a-z]{4}-[a-z]{3})')
+
+
+def _history_value(item, key):
+    """
+    Function to read a value from a history item, which uses the DynamoDB {"S": value} encoding.
+    """
+    value = item.get(key)
+    if isinstance(value, dict):
+        value = value.get('S')
+    return value
+
+def conference_id_from_url(meeting_url):
+    match = MEET_CODE_PATTERN.search(meeting_url or '')
+    return match.group(1) if match else None
+
+def get_order_high_water_mark():
+    """
+    Function to return the highest Transkriptor OrderID already recorded.
+    """
+    max_order_id = TranskriptorOrder.objects.aggregate(max_order_id=Max('order_id'))['max_order_id']
+    return max_order_id if max_order_id is not None else settings.TRANSKRIPTOR_INITIAL_ORDER_ID
+
+def record_new_orders(history):
+    """
+    Function to store the history orders above the high-water mark as pending orders.
+    Orders without a meeting URL cannot be matched to an event and are stored as unmatched,
+    for manual review, instead of pending.
+    """
+    high_water_mark = get_order_high_water_mark()
+
+    new_orders = []
+    for item in history:
+        order_id = int(_history_value(item, 'OrderID'))
+        if order_id <= high_water_mark:
+            continue
+        meeting_url = _history_value(item, settings.TRANSKRIPTOR_HISTORY_MEETING_URL_KEY) or None
+        new_orders.append(TranskriptorOrder(
+            order_id=order_id,
+            meeting_url=meeting_url,
+            conference_id=conference_id_from_url(meeting_url),
+            status='pending' if meeting_url else 'unmatched'
+        ))
+
+    TranskriptorOrder.objects.bulk_create(new_orders, ignore_conflicts=True)
+    return len(new_orders)
+
+def match_pending_orders():
+    """
+    Function to attach pending orders to their CalendarEvent.
+
+    Orders are joined to active events through the indexed conference_id/hangout_link
+    columns in a single query. An order whose event is not synced yet stays pending until
+    ORDER_MATCH_MAX_AGE, then it is set aside as unmatched so it is not rescanned every
+    tick. Returns the matched orders.
+    """
+    TranskriptorOrder.objects.filter(
+        status='pending',
+        calendar_event__isnull=True,
+        created_at__lt=timezone.now() - timedelta(seconds=settings.ORDER_MATCH_MAX_AGE)
+    ).update(status='unmatched')
+
+    pending_orders = list(
+        TranskriptorOrder.objects.filter(status='pending').select_related('calendar_event').order_by('order_id')
+    )
+    if not pending_orders:
+        return []
+
+    # Orders matched on an earlier tick whose processing did not finish keep their event
+    matched_orders = [order for order in pending_orders if order.calendar_event_id]
+    claimed_event_ids = {order.calendar_event_id for order in matched_orders}
+    previously_matched_ids = {order.id for order in matched_orders}
+    pending_orders = [order for order in pending_orders if not order.calendar_event_id and order.meeting_url]
+
+    conference_ids = {order.conference_id for order in pending_orders if order.conference_id}
+    meeting_urls = {order.meeting_url for order in pending_orders}
+
+    # Events already attached to an order that is still being processed are not available
+    events_by_conference_id = {}
+    events_by_meeting_url = {}
+    if pending_orders:
+        for calendar_event in CalendarEvent.objects.filter(
+            Q(conference_id__in=conference_ids) | Q(hangout_link__in=meeting_urls),
+            status='active',
+            transkriptor_orders__isnull=True
+        ).order_by('start_time'):
+            if calendar_event.conference_id:
+                events_by_conference_id.setdefault(calendar_event.conference_id, calendar_event)
+            if calendar_event.hangout_link:
+                events_by_meeting_url.setdefault(calendar_event.hangout_link, calendar_event)
+
+    for order in pending_orders:
+        # Orders whose event has not been synced yet stay pending until the next tick
+        calendar_event = (
+            events_by_conference_id.get(order.conference_id)
+            or events_by_meeting_url.get(order.meeting_url)
+        )
+        if calendar_event is None or calendar_event.id in claimed_event_ids:
+            continue
+        order.calendar_event = calendar_event
+        claimed_event_ids.add(calendar_event.id)
+        matched_orders.append(order)
+
+    TranskriptorOrder.objects.bulk_update(
+        [order for order in matched_orders if order.id not in previously_matched_ids], ['calendar_event']
+    )
+    return matched_orders
@@ -0,0 +1,51 @@
+# pagination.py
+import base64, json
+
+from dateutil.parser import isoparse
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(calendar_event):
+    """
+    Function to encode the (start_time, id) keyset position after an event as an opaque cursor.
+    """
+    position = json.dumps([calendar_event.start_time.isoformat(), calendar_event.id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        start_time, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return isoparse(start_time), int(event_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def parse_page_size(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except ValueError as e:
+        raise ValueError('limit must be an integer') from e
+    if page_size < 1:
+        raise ValueError('limit must be positive')
+    return min(page_size, MAX_PAGE_SIZE)
+
+def paginate_events(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Function to return one keyset page of events ordered by (start_time, id) and the cursor of the next page.
+
+    The cursor seeks past the last returned row instead of using OFFSET, so every
+    page is an index range scan regardless of how deep the client has paged.
+    """
+    if cursor:
+        start_time, event_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(start_time__gt=start_time) | Q(start_time=start_time, id__gt=event_id)
+        )
+
+    page = list(queryset.order_by('start_time', 'id')[:page_size + 1])
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return page[:page_size], next_cursor
@@ -0,0 +1,196 @@
+# rate_limits.py
+import asyncio, random, time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+# Token buckets refilled continuously at RATE tokens per second up to BURST tokens.
+# KEYS[1] is the provider's block key set on a 429, KEYS[2] its stats hash and the rest
+# are the buckets, ARGV holds the token count, the time in ms and a RATE/BURST pair per
+# bucket. Tokens are only taken when every bucket has enough; otherwise the number of
+# milliseconds to wait is returned.
+TOKEN_BUCKET_SCRIPT = """
+local blocked = redis.call('PTTL', KEYS[1])
+if blocked > 0 then
+    return blocked
+end
+
+local requested = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local levels = {}
+local wait = 0
+for i = 3, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 3])
+    local burst = tonumber(ARGV[2 * i - 2])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+    levels[i] = tokens
+    if tokens < requested then
+        wait = math.max(wait, math.ceil((requested - tokens) * 1000 / rate))
+    end
+end
+
+for i = 3, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 3])
+    local burst = tonumber(ARGV[2 * i - 2])
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - requested
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(burst * 1000 / rate) + 1000)
+end
+
+if wait == 0 then
+    redis.call('HINCRBY', KEYS[2], 'granted', requested)
+end
+return wait
+"""
+
+
+class RateLimited(Exception):
+    """
+    Raised when a call cannot get a token within its allowed wait. 'retry_after' is in seconds.
+    """
+    def __init__(self, provider, retry_after):
+        super().__init__(f"{provider} rate limit reached, retry in {retry_after:.1f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+@lru_cache(maxsize=None)
+def get_redis():
+    return redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL)
+
+@lru_cache(maxsize=None)
+def get_script():
+    return get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+
+def _buckets(provider, key=None):
+    """
+    Function to list the (redis key, rate, burst) buckets a call to the provider draws from:
+    the provider-wide one and, when 'key' is given, the one of that credential.
+    """
+    limit = settings.RATE_LIMITS[provider]
+    buckets = [(f"ratelimit:{provider}", limit['RATE'], limit['BURST'])]
+    account_limit = settings.RATE_LIMITS.get(f"{provider}_account")
+    if key is not None and account_limit:
+        buckets.append((f"ratelimit:{provider}:{key}", account_limit['RATE'], account_limit['BURST']))
+    return buckets
+
+def try_acquire(provider, key=None, tokens=1):
+    """
+    Function to take tokens for one call. Returns 0 when granted, else the seconds to wait.
+    The limiter fails open: calls go through unthrottled while Redis is unreachable.
+    """
+    buckets = _buckets(provider, key)
+    args = [tokens, int(time.time() * 1000)]
+    for _, rate, burst in buckets:
+        args.extend([rate, burst])
+    try:
+        wait = get_script()(
+            keys=[f"ratelimit:{provider}:blocked", f"ratelimit:{provider}:stats"] + [bucket[0] for bucket in buckets],
+            args=args
+        )
+    except redis.exceptions.RedisError as e:
+        print(f"Rate limiter unavailable, not throttling {provider}: {e}")
+        return 0
+    return int(wait) / 1000.0
+
+def _record(provider, field):
+    try:
+        get_redis().hincrby(f"ratelimit:{provider}:stats", field, 1)
+    except redis.exceptions.RedisError:
+        pass
+
+def acquire(provider, key=None, tokens=1, max_wait=None):
+    """
+    Function to block until the call may go out. Raises RateLimited instead of waiting
+    longer than 'max_wait' seconds, so a task can be requeued rather than hold its worker.
+    """
+    deadline = time.monotonic() + (max_wait if max_wait is not None else settings.RATE_LIMIT_MAX_WAIT)
+    while True:
+        wait = try_acquire(provider, key, tokens)
+        if not wait:
+            return
+        if time.monotonic() + wait > deadline:
+            _record(provider, 'deferred')
+            raise RateLimited(provider, wait)
+        time.sleep(wait)
+
+async def aacquire(provider, key=None, tokens=1):
+    """
+    asyncio counterpart of acquire; waits on the loop for as long as needed.
+    """
+    while True:
+        wait = await asyncio.to_thread(try_acquire, provider, key, tokens)
+        if not wait:
+            return
+        await asyncio.sleep(wait)
+
+def defer(provider, retry_after):
+    """
+    Function to hold every call to the provider, from all workers, after it answered 429.
+    """
+    _record(provider, 'throttled')
+    try:
+        get_redis().set(f"ratelimit:{provider}:blocked", 1, px=max(1, int(retry_after * 1000)))
+    except redis.exceptions.RedisError as e:
+        print(f"Rate limiter unavailable, could not defer {provider}: {e}")
+
+def retry_after_seconds(headers, default=None):
+    """
+    Function to read a Retry-After header, given either in seconds or as an HTTP date.
+    """
+    default = default if default is not None else settings.RATE_LIMIT_DEFAULT_RETRY_AFTER
+    value = (headers or {}).get('retry-after') or (headers or {}).get('Retry-After')
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+def requeue(task, retry_after):
+    """
+    Function to put a rate limited Celery task back on its queue once its budget allows.
+    Returns False when the task is out of retries.
+    """
+    if task.request.retries >= task.max_retries:
+        print(f"{task.name} is still rate limited after {task.request.retries} retries, giving up")
+        return False
+    # The jitter spreads tasks deferred together over the refill
+    task.retry(countdown=retry_after + random.uniform(0, 1), throw=False)
+    return True
+
+def budget_report():
+    """
+    Function to return and reset each provider's counters since the previous report:
+    tokens granted, calls deferred for lack of budget and 429 answers, next to the quota.
+    """
+    report = {}
+    try:
+        for provider, limit in settings.RATE_LIMITS.items():
+            if provider.endswith('_account'):
+                continue
+            pipeline = get_redis().pipeline()
+            pipeline.hgetall(f"ratelimit:{provider}:stats")
+            pipeline.delete(f"ratelimit:{provider}:stats")
+            stats, _ = pipeline.execute()
+            report[provider] = {
+                'granted': int(stats.get(b'granted', 0)),
+                'deferred': int(stats.get(b'deferred', 0)),
+                'throttled': int(stats.get(b'throttled', 0)),
+                'rate': limit['RATE'],
+            }
+    except redis.exceptions.RedisError as e:
+        print(f"Rate limiter unavailable, no budget report: {e}")
+    return report
@@ -0,0 +1,83 @@
+# scheduler.py
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import CalendarEvent
+
+JOIN_MEETING_BOT_TASK = 'calendar_api_service.tasks.join_meeting_bot'
+
+
+def _join_time(calendar_event):
+    """
+    Function to return when the bot should join the event, or None if it should not be scheduled (yet).
+    """
+    if calendar_event.status != 'active' or not calendar_event.hangout_link or calendar_event.bot_dispatched_at:
+        return None
+
+    now = timezone.now()
+    start_time = calendar_event.start_time
+    if start_time < now - timedelta(seconds=settings.BOT_JOIN_GRACE_PERIOD):
+        return None
+    # Far-off events are picked up later by schedule_pending_bot_joins so ETA tasks stay short-lived in the broker
+    if start_time > now + timedelta(seconds=settings.BOT_JOIN_SCHEDULE_HORIZON):
+        return None
+    return start_time
+
+def _store_schedule(calendar_event, task_id, scheduled_for):
+    CalendarEvent.objects.filter(id=calendar_event.id).update(bot_task_id=task_id, bot_scheduled_for=scheduled_for)
+    calendar_event.bot_task_id = task_id
+    calendar_event.bot_scheduled_for = scheduled_for
+
+def schedule_bot_join(calendar_event):
+    """
+    Function to enqueue a single ETA task that adds the meeting bot at the event's start time.
+    An already scheduled task for a moved event is revoked and replaced.
+    """
+    join_time = _join_time(calendar_event)
+    if calendar_event.bot_scheduled_for == join_time:
+        return
+
+    if calendar_event.bot_task_id:
+        current_app.control.revoke(calendar_event.bot_task_id)
+
+    if join_time is None:
+        _store_schedule(calendar_event, None, None)
+        return
+
+    result = current_app.send_task(
+        JOIN_MEETING_BOT_TASK,
+        args=[calendar_event.id, join_time.isoformat()],
+        eta=max(join_time, timezone.now())
+    )
+    _store_schedule(calendar_event, result.id, join_time)
+
+def cancel_bot_join(calendar_event):
+    """
+    Function to revoke the pending bot-join task of a deleted or cancelled event.
+    """
+    if calendar_event.bot_task_id:
+        current_app.control.revoke(calendar_event.bot_task_id)
+        _store_schedule(calendar_event, None, None)
+
+def schedule_pending_bot_joins():
+    """
+    Function to schedule bot joins for events entering the scheduling horizon.
+    Only looks at active, undispatched events starting within the horizon.
+    """
+    now = timezone.now()
+    pending_events = CalendarEvent.objects.filter(
+        status='active',
+        hangout_link__isnull=False,
+        bot_dispatched_at__isnull=True,
+        start_time__gte=now - timedelta(seconds=settings.BOT_JOIN_GRACE_PERIOD),
+        start_time__lte=now + timedelta(seconds=settings.BOT_JOIN_SCHEDULE_HORIZON)
+    ).filter(
+        Q(bot_scheduled_for__isnull=True) | ~Q(bot_scheduled_for=F('start_time'))
+    )
+
+    for calendar_event in pending_events:
+        schedule_bot_join(calendar_event)
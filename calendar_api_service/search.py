@@ -0,0 +1,177 @@
+# search.py
+import heapq, math, re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Transcript, TranscriptTermPosting
+from .transcripts import SPEAKER_KEY, TRANSCRIPT_START_KEYS, read_segments, segment_time
+
+TOKEN_PATTERN = re.compile(r'\w+')
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+MAX_TERM_LENGTH = 100
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """
+    Function to split text into lowercased tokens, returned with their character offsets.
+    """
+    return [
+        (match.group().lower(), match.start(), match.end())
+        for match in TOKEN_PATTERN.finditer(text or '')
+        if len(match.group()) <= MAX_TERM_LENGTH
+    ]
+
+def parse_query(query):
+    """
+    Function to split a query into loose terms and quoted phrases.
+    """
+    phrases = [
+        [token for token, _, _ in tokenize(phrase)]
+        for phrase in PHRASE_PATTERN.findall(query)
+    ]
+    phrases = [phrase for phrase in phrases if phrase]
+    terms = [token for token, _, _ in tokenize(PHRASE_PATTERN.sub(' ', query))]
+    return terms, phrases
+
+def index_transcript_terms(transcript):
+    """
+    Function to add a stored transcript's segments to the inverted index, once.
+    """
+    if transcript.indexed_at is not None:
+        return
+
+    postings = []
+    token_count = 0
+    for segment_index, chat in enumerate(read_segments(transcript)):
+        tokens = tokenize(chat.get('text'))
+        token_count += len(tokens)
+
+        positions = defaultdict(list)
+        for position, (token, _, _) in enumerate(tokens):
+            positions[token].append(position)
+
+        for term, term_positions in positions.items():
+            postings.append(TranscriptTermPosting(
+                term=term,
+                transcript=transcript,
+                segment_index=segment_index,
+                speaker=chat.get(SPEAKER_KEY),
+                start_ms=segment_time(chat, TRANSCRIPT_START_KEYS),
+                term_frequency=len(term_positions),
+                segment_length=len(tokens),
+                positions=term_positions
+            ))
+
+    with transaction.atomic():
+        TranscriptTermPosting.objects.bulk_create(postings, batch_size=1000, ignore_conflicts=True)
+        transcript.token_count = token_count
+        transcript.indexed_at = timezone.now()
+        transcript.save(update_fields=['token_count', 'indexed_at'])
+
+def _contains_phrase(positions_by_term, phrase):
+    """
+    Function to check whether the phrase terms occur at consecutive positions of one segment.
+    """
+    if any(term not in positions_by_term for term in phrase):
+        return False
+    following = [set(positions_by_term[term]) for term in phrase[1:]]
+    return any(
+        all(start + offset + 1 in positions for offset, positions in enumerate(following))
+        for start in positions_by_term[phrase[0]]
+    )
+
+def search_transcripts(query, transcripts=None, speaker=None, start_ms=None, end_ms=None, limit=20):
+    """
+    Function to rank transcript segments against a query with BM25.
+
+    'transcripts' is an optional Transcript queryset restricting the search (by owner,
+    meeting time, a single meeting...); the BM25 statistics are computed over it alone, so
+    other transcripts neither leak into nor skew the ranking. Quoted phrases must appear
+    verbatim in a segment.
+    Returns up to 'limit' hits as dicts holding the segment, its score and the character
+    offsets of the matched terms in its text.
+    """
+    terms, phrases = parse_query(query)
+    query_terms = set(terms) | {term for phrase in phrases for term in phrase}
+    if not query_terms:
+        return []
+
+    indexed = Transcript.objects.filter(indexed_at__isnull=False)
+    if transcripts is not None:
+        indexed = indexed.filter(id__in=transcripts.values('id'))
+    corpus = indexed.aggregate(segments=Sum('segment_count'), tokens=Sum('token_count'))
+    if not corpus['segments']:
+        return []
+    average_length = (corpus['tokens'] or 0) / corpus['segments'] or 1
+
+    postings = TranscriptTermPosting.objects.filter(term__in=query_terms, transcript__in=indexed.values('id'))
+    document_frequency = dict(postings.values_list('term').annotate(count=Count('id')).order_by())
+
+    if speaker:
+        postings = postings.filter(speaker=speaker)
+    if start_ms is not None:
+        postings = postings.filter(Q(start_ms__gte=start_ms) | Q(start_ms__isnull=True))
+    if end_ms is not None:
+        postings = postings.filter(Q(start_ms__lt=end_ms) | Q(start_ms__isnull=True))
+
+    segments = defaultdict(dict)
+    segment_lengths = {}
+    for transcript_id, segment_index, term, term_frequency, segment_length, positions in postings.values_list(
+        'transcript_id', 'segment_index', 'term', 'term_frequency', 'segment_length', 'positions'
+    ):
+        key = (transcript_id, segment_index)
+        segments[key][term] = positions
+        segment_lengths[key] = segment_length
+
+    scored = []
+    for key, positions_by_term in segments.items():
+        if not all(_contains_phrase(positions_by_term, phrase) for phrase in phrases):
+            continue
+        score = 0.0
+        for term, positions in positions_by_term.items():
+            df = document_frequency.get(term, 0)
+            idf = math.log(1 + (corpus['segments'] - df + 0.5) / (df + 0.5))
+            tf = len(positions)
+            norm = 1 - BM25_B + BM25_B * segment_lengths[key] / average_length
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        scored.append((score, key))
+
+    top = heapq.nlargest(limit, scored)
+
+    # Only the blocks holding the top segments are decompressed to build the hits
+    transcripts_by_id = Transcript.objects.select_related('order', 'calendar_event').in_bulk(
+        {transcript_id for _, (transcript_id, _) in top}
+    )
+    hits = []
+    for score, (transcript_id, segment_index) in top:
+        transcript = transcripts_by_id[transcript_id]
+        chat = read_segments(transcript, offset=segment_index, limit=1)[0]
+        offsets = [
+            [start, end] for token, start, end in tokenize(chat.get('text'))
+            if token in segments[(transcript_id, segment_index)]
+        ]
+        hits.append({
+            'orderId': str(transcript.order.order_id),
+            'calendar_event': transcript.calendar_event_id,
+            'summary': transcript.calendar_event.summary if transcript.calendar_event else None,
+            'segment_index': segment_index,
+            'score': round(score, 4),
+            'segment': chat,
+            'offsets': offsets,
+        })
+    return hits
+
+def retrieve_context(query, vector_store_id, limit=5):
+    """
+    Function to fetch the best matching segments of the meeting behind a vector store,
+    formatted as transcript lines to pass to the chatbot alongside the question.
+    """
+    transcripts = Transcript.objects.filter(order__vector_store_id=vector_store_id)
+    hits = search_transcripts(query, transcripts=transcripts, limit=limit)
+    return [f"{hit['segment'].get(SPEAKER_KEY)} : {hit['segment'].get('text')}" for hit in hits]
@@ -5,9 +5,34 @@ class JoinMeetingRequestSerializer(serializers.Serializer):
     meeting_url = serializers.URLField(required=True, help_text="URL of the meeting to join")
 
 class CalendarEventSerializer(serializers.ModelSerializer):
+    """
+    Accepts an optional 'fields' argument to only serialize a subset of the fields.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+    @classmethod
+    def parse_fields(cls, value):
+        """
+        Parse a comma separated 'fields' query parameter, rejecting unknown field names.
+        """
+        if not value:
+            return None
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        unknown = set(fields) - set(cls().fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return fields
+
     class Meta:
         model = CalendarEvent
-        fields = '__all__'
+        # Bot scheduling state is internal and written without signals, so it is not exposed;
+        # the owner is always the requesting user
+        exclude = ['owner', 'bot_task_id', 'bot_scheduled_for', 'bot_dispatched_at']
         extra_kwargs = {
             'event_id': {'required': False, 'allow_null': True, 'allow_blank': True},
             'google_credentials': {'required': False, 'allow_null': True},
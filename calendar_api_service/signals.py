@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .event_cache import bump_event_list_versions
+from .models import CalendarEvent, GoogleCredentials
+
+@receiver(post_save, sender=CalendarEvent)
+@receiver(post_delete, sender=CalendarEvent)
+def invalidate_event_lists(sender, instance, **kwargs):
+    if instance.owner_id is not None:
+        bump_event_list_versions([instance.owner_id])
+
+@receiver(post_delete, sender=GoogleCredentials)
+def invalidate_account_event_lists(sender, instance, **kwargs):
+    bump_event_list_versions([instance.user_id])
@@ -0,0 +1,208 @@
+# sync.py
+import operator
+from collections import defaultdict
+from datetime import datetime
+from functools import reduce
+
+from dateutil.parser import isoparse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+
+from .event_cache import bump_event_list_versions
+from .models import CalendarEvent
+from .rate_limits import acquire
+from .scheduler import schedule_bot_join, cancel_bot_join
+
+EVENT_FIELDS = [
+    'summary', 'description', 'location', 'start_time', 'end_time', 'organizer_email',
+    'creator_email', 'hangout_link', 'conference_id', 'conference_solution_name'
+]
+
+def event_defaults(event):
+    """
+    Function to map a Google Calendar event resource onto CalendarEvent fields.
+    """
+    return {
+        'summary': event.get('summary', ''),
+        'description': event.get('description', ''),
+        'location': event.get('location', ''),
+        'start_time': event['start'].get('dateTime'),
+        'end_time': event['end'].get('dateTime'),
+        'organizer_email': event.get('organizer', {}).get('email'),
+        'creator_email': event.get('creator', {}).get('email'),
+        'hangout_link': event.get('hangoutLink'),
+        'conference_id': event.get('conferenceData', {}).get('conferenceId'),
+        'conference_solution_name': event.get('conferenceData', {}).get('conferenceSolution', {}).get('name')
+    }
+
+def list_calendar_events(service, sync_token=None, limiter_key=None):
+    """
+    Function to page through events().list and return (events, next_sync_token).
+
+    Without a sync token this is a full listing of upcoming events; with one it
+    only returns the events changed since that token was issued, including
+    cancelled ones. Every page takes a token from the Google rate limiter, and from
+    the account's own bucket when 'limiter_key' is given.
+    """
+    if sync_token:
+        params = {'calendarId': 'primary', 'syncToken': sync_token}
+    else:
+        params = {'calendarId': 'primary', 'timeMin': datetime.utcnow().isoformat() + 'Z'}
+
+    events = []
+    while True:
+        acquire('google', limiter_key)
+        events_result = service.events().list(**params).execute()
+        events.extend(events_result.get('items', []))
+        page_token = events_result.get('nextPageToken')
+        if not page_token:
+            return events, events_result.get('nextSyncToken')
+        params['pageToken'] = page_token
+
+def upsert_calendar_events(google_credentials, events):
+    """
+    Function to write a page of one account's Google events (full or delta) to CalendarEvent rows.
+    Returns the (created, updated) CalendarEvent lists.
+    """
+    return upsert_account_events([(google_credentials, events)])
+
+def upsert_account_events(account_events):
+    """
+    Function to write the Google events (full or delta) of one or many accounts to CalendarEvent rows in bulk.
+
+    'account_events' holds (google_credentials, events) pairs. Existing rows of every
+    account are loaded in a single query keyed on (account, event_id), unchanged rows
+    are skipped and the rest go through one bulk_create and one bulk_update inside a
+    single transaction. The bulk_create upserts on the (google_credentials, event_id)
+    constraint, so a row inserted concurrently by another sync of the account is updated
+    instead of failing the transaction. Cancelled events mark their active row as deleted
+    and revoke their bot-join task. Returns the (created, updated) CalendarEvent lists.
+    """
+    credentials_by_id = {}
+    incoming = {}
+    cancelled_ids = defaultdict(list)
+    for google_credentials, events in account_events:
+        credentials_by_id[google_credentials.id] = google_credentials
+        for event in events:
+            if event.get('status') == 'cancelled':
+                cancelled_ids[google_credentials.id].append(event['id'])
+                continue
+
+            # All-day events carry a 'date' instead of a 'dateTime' and cannot be joined by the bot
+            if not event['start'].get('dateTime'):
+                continue
+
+            defaults = event_defaults(event)
+            defaults['start_time'] = isoparse(defaults['start_time'])
+            defaults['end_time'] = isoparse(defaults['end_time'])
+            incoming[(google_credentials.id, event['id'])] = defaults
+
+    incoming_ids = defaultdict(list)
+    for credentials_id, event_id in incoming:
+        incoming_ids[credentials_id].append(event_id)
+
+    created, updated, cancelled = [], [], []
+    with transaction.atomic():
+        existing = {}
+        if incoming_ids:
+            for calendar_event in CalendarEvent.objects.filter(_account_events_filter(incoming_ids)):
+                existing[(calendar_event.google_credentials_id, calendar_event.event_id)] = calendar_event
+
+        for (credentials_id, event_id), defaults in incoming.items():
+            calendar_event = existing.get((credentials_id, event_id))
+            if calendar_event is None:
+                created.append(CalendarEvent(
+                    google_credentials=credentials_by_id[credentials_id],
+                    owner_id=credentials_by_id[credentials_id].user_id,
+                    event_id=event_id,
+                    **defaults
+                ))
+                continue
+
+            changed = False
+            for field, value in defaults.items():
+                if getattr(calendar_event, field) != value:
+                    setattr(calendar_event, field, value)
+                    changed = True
+            if changed:
+                updated.append(calendar_event)
+
+        if created:
+            CalendarEvent.objects.bulk_create(
+                created,
+                batch_size=settings.CALENDAR_SYNC_WRITE_BATCH,
+                update_conflicts=True,
+                unique_fields=['google_credentials', 'event_id'],
+                update_fields=EVENT_FIELDS
+            )
+        if updated:
+            CalendarEvent.objects.bulk_update(updated, EVENT_FIELDS, batch_size=settings.CALENDAR_SYNC_WRITE_BATCH)
+        if cancelled_ids:
+            cancelled = list(CalendarEvent.objects.filter(_account_events_filter(cancelled_ids), status='active'))
+            CalendarEvent.objects.filter(id__in=[event.id for event in cancelled]).update(status='deleted')
+
+    # Bulk writes bypass the model signals, so the list caches are invalidated here
+    bump_event_list_versions({
+        credentials_by_id[calendar_event.google_credentials_id].user_id
+        for calendar_event in created + updated + cancelled
+    })
+
+    # New or moved meetings get their bot-join task (re)scheduled, cancelled ones lose it
+    for calendar_event in created + updated:
+        schedule_bot_join(calendar_event)
+    for calendar_event in cancelled:
+        cancel_bot_join(calendar_event)
+
+    return created, updated
+
+def _account_events_filter(event_ids_by_account):
+    """
+    Function to build the Q matching the given event ids of each account, for one query over all of them.
+    """
+    return reduce(operator.or_, (
+        Q(google_credentials_id=credentials_id, event_id__in=event_ids)
+        for credentials_id, event_ids in event_ids_by_account.items()
+    ))
+
+def sync_google_calendar(google_credentials, service):
+    """
+    Function to incrementally sync one account's primary calendar.
+
+    Uses the stored sync token to request only the changes since the last tick
+    and falls back to a full resync when Google invalidates the token (410 Gone).
+    Returns the number of events received from Google.
+    """
+    sync_token = google_credentials.sync_token
+    try:
+        events, next_sync_token = list_calendar_events(service, sync_token, google_credentials.id)
+    except HttpError as e:
+        if e.resp.status != 410 or not sync_token:
+            raise
+        print(f"Sync token expired for {google_credentials.email}, running a full resync")
+        events, next_sync_token = list_calendar_events(service, limiter_key=google_credentials.id)
+
+    upsert_calendar_events(google_credentials, events)
+
+    google_credentials.sync_token = next_sync_token
+    google_credentials.last_synced_at = timezone.now()
+    google_credentials.save(update_fields=['sync_token', 'last_synced_at'])
+
+    return len(events)
+
+def is_rate_limit_error(error):
+    """
+    Function to tell whether a Google HttpError is a quota error rather than a real failure.
+    Google answers 429, or 403 with a rateLimitExceeded/userRateLimitExceeded reason.
+    """
+    if error.resp.status == 429:
+        return True
+    if error.resp.status != 403:
+        return False
+    return any(
+        detail.get('reason') in ('rateLimitExceeded', 'userRateLimitExceeded')
+        for detail in error.error_details or []
+        if isinstance(detail, dict)
+    )
@@ -1,37 +1,44 @@
 # tasks.py
-import requests, json, io, re
-from datetime import datetime, timedelta
-from celery import shared_task
-from googleapiclient.discovery import build
-import google.oauth2.credentials
+import requests, json
+import openai
+from celery import shared_task, chain
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from dateutil.parser import isoparse
-from pydub import AudioSegment
-from pydub.utils import which
-from io import BytesIO
-from openai import OpenAI
+from googleapiclient.errors import HttpError
 
-from .models import GoogleCredentials, CalendarEvent
-
-AudioSegment.converter = which("ffmpeg")
-AudioSegment.ffprobe = which("ffprobe")
-
-last_order_id = 1727253113783446562
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+from .models import GoogleCredentials, CalendarEvent, TranskriptorOrder, Transcript
+from .answers import STANDARD_ARTIFACTS, precompute_artifacts
+from .async_sync import sync_all_google_calendars
+from .audio import get_audio_duration
+from .chat import AssistantRunError
+from .credentials import get_credentials, save_credentials, refresh_expiring_credentials
+from .google_services import calendar_service
+from .orders import record_new_orders, match_pending_orders
+from .rate_limits import RateLimited, budget_report, defer, requeue, retry_after_seconds
+from .scheduler import schedule_pending_bot_joins
+from .search import index_transcript_terms
+from .sync import sync_google_calendar, is_rate_limit_error
+from .transcripts import store_transcript
+from .transkriptor import get_client
+from .utils import acquire_lock, refresh_lock, release_lock
+from .vector_stores import claim_indexed_orders, ingest_transcripts
+from .watch import accounts_due_for_sync, renew_watch_channels, request_account_sync, sync_dirty_key
 
 def add_meeting_bot(meeting_url):
     """
     Function to add the meeting bot to a specified meeting URL.
     """
-    parameters = {
-        "meetingUrl": meeting_url,
-        "language": "en-US",
-        "apiKey": settings.TRANSKRIPTOR_API_KEY
-    }
+    try:
+        response = get_client().join_meeting(meeting_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Failed to add Meeting Bot to {meeting_url}: {e}")
+        return False
 
-    response = requests.get(settings.TRANSKRIPTOR_JOIN_MEETING_URL, params=parameters)
     if response.status_code == 200:
         print(f"Meeting Bot Added Successfully to {meeting_url}")
         return True
@@ -41,16 +48,26 @@ def add_meeting_bot(meeting_url):
 
 def get_event_transcription(orderId):
     """
-    Functino to fetch the event transcription by orderId
+    Function to fetch the event transcription by orderId.
+    Errors are raised so the pipeline stage calling it can retry.
     """
-    parameters = {
-        "orderid": orderId
-    }
+    response = get_client().get_content(orderId)
+    response.raise_for_status()
+    return json.loads(response.content)
 
+def handle_finished_events_history(history=None):
+    """
+    Function to retrieve the events history, record the orders that are new since the
+    last tick and start the post-processing pipeline for the ones matched to an event.
+    A history already fetched by the async dispatcher can be passed in.
+    """
     try:
-        response = requests.get(settings.TRANSKRIPTOR_GET_CONTENT_URL, params=parameters)
-        response.raise_for_status()
-        return response.content
+        parsed_data = history if history is not None else get_client().get_history()
+        record_new_orders(parsed_data)
+
+        for order in match_pending_orders():
+            start_order_pipeline(order)
+
     except requests.exceptions.RequestException as e:
         print(f"HTTP request failed: {e}")
     except json.JSONDecodeError as e:
@@ -60,140 +77,355 @@ def get_event_transcription(orderId):
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
-def get_audio_duration(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        audio = AudioSegment.from_file(BytesIO(response.content))
-        duration_in_seconds = int(len(audio) / 1000.0)
-        return duration_in_seconds
-    except requests.exceptions.RequestException as e:
-        print(f"HTTP request failed: {e}")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-
-def save_meeting_content_to_vector_store(name, content):
-    vector_store = client.beta.vector_stores.create(name=name)
-    
-    filtered_content = [
-        f"{chat['Speaker']} : {chat['text']}"
-        for chat in content
-    ]
-
-    file_stream = io.BytesIO(json.dumps(filtered_content).encode())
-    file_stream.name = "meeting_content.txt"
-
-    client.beta.vector_stores.file_batches.upload_and_poll(
-        vector_store_id=vector_store.id,
-        files=[file_stream]
+def start_order_pipeline(order):
+    """
+    Function to chain the post-processing stages of a finished meeting's order.
+
+    Every stage runs on its own queue, retries on its own and is keyed by
+    '<stage>:<order_id>', so a stage that already completed is a no-op when run again.
+    The chain ends by queueing the order for ingest_transcript_batch, which finishes it
+    once its vector store is ready.
+    """
+    # Claiming the order keeps the next tick from starting a second pipeline for it
+    claimed = TranskriptorOrder.objects.filter(id=order.id, status='pending').update(
+        status='processing', attempts=F('attempts') + 1
     )
+    if not claimed:
+        return
 
-    return vector_store.id
+    chain(
+        fetch_transcript.si(order.id).set(task_id=f"fetch_transcript:{order.order_id}"),
+        build_search_index.s().set(task_id=f"build_search_index:{order.order_id}"),
+        probe_duration.s().set(task_id=f"probe_duration:{order.order_id}"),
+        request_indexing.s().set(task_id=f"request_indexing:{order.order_id}"),
+    ).on_error(release_order.si(order.id)).apply_async()
+
+def finish_order_pipeline(order):
+    """
+    Function to chain the stages of an order that run once its transcript is in a vector store.
+    """
+    chain(
+        mark_finished.si({'order': order.id}).set(task_id=f"mark_finished:{order.order_id}"),
+        precompute_meeting_artifacts.s().set(task_id=f"precompute_meeting_artifacts:{order.order_id}"),
+    ).on_error(release_order.si(order.id)).apply_async()
 
-def handle_finished_events_history():
+@shared_task(
+    autoretry_for=(requests.exceptions.RequestException,),
+    retry_backoff=True,
+    max_retries=5
+)
+def fetch_transcript(order_pk):
     """
-    Function to retrieve the events history and update the 'orderId' of active events
-    based on the retrieved data.
+    Pipeline stage downloading the transcript of an order into the local transcript store.
     """
+    order = TranskriptorOrder.objects.get(id=order_pk)
+    if not Transcript.objects.filter(order=order).exists():
+        parsed_event_transcription = get_event_transcription(str(order.order_id))
+        store_transcript(order, parsed_event_transcription)
 
-    global previous_ordered_events_length
+        order.sound_url = parsed_event_transcription['sound']
+        order.save(update_fields=['sound_url'])
 
-    parameters = {
-        "apiKey": settings.TRANSKRIPTOR_API_KEY
-    }
+    return {'order': order_pk}
+
+@shared_task
+def build_search_index(payload):
+    """
+    Pipeline stage adding the stored transcript to the local full-text index.
+    """
+    transcript = Transcript.objects.get(order_id=payload['order'])
+    index_transcript_terms(transcript)
+    return payload
+
+@shared_task(
+    autoretry_for=(requests.exceptions.RequestException,),
+    retry_backoff=True,
+    max_retries=3
+)
+def probe_duration(payload):
+    """
+    Pipeline stage computing the meeting duration from the transcript or recording.
+    """
+    order = TranskriptorOrder.objects.select_related('transcript').get(id=payload['order'])
+    if order.duration is None:
+        if order.transcript.duration_ms is not None:
+            order.duration = int(order.transcript.duration_ms / 1000.0)
+        else:
+            order.duration = get_audio_duration(order.sound_url)
+        order.save(update_fields=['duration'])
+    return payload
+
+@shared_task
+def request_indexing(payload):
+    """
+    Pipeline stage queueing the stored transcript for the next vector store ingestion batch.
+    """
+    TranskriptorOrder.objects.filter(
+        id=payload['order'],
+        indexing_requested_at__isnull=True
+    ).update(indexing_requested_at=timezone.now())
+    return payload
+
+@shared_task
+def ingest_transcript_batch():
+    """
+    Beat task uploading the transcripts queued by request_indexing to the vector store in
+    one batch, then finishing the pipeline of every order whose store is ready.
+
+    Readiness is read back from the database on every tick, after errors too, so orders
+    ingested by a tick that failed half-way are still finished. Failed uploads are left
+    queued for the next tick.
+    """
+    lock = acquire_lock("vector-store-ingest", settings.VECTOR_STORE_INGEST_TIMEOUT)
+    if not lock:
+        print("Previous vector store ingestion is still running, skipping")
+        return
 
     try:
-        response = requests.get(settings.TRANSKRIPTOR_GET_HISTORY_URL, params=parameters)
-        response.raise_for_status()
-        
-        parsed_data = json.loads(json.loads((response.text)))
-
-        filtered_data = [event for event in parsed_data if int(event["OrderID"]["S"]) > last_order_id]
-        length = len(filtered_data)
-
-        if len(filtered_data) > 0:
-            active_events = CalendarEvent.objects.filter(status='active').order_by('start_time')
-            for i in range(length):
-                if i < len(active_events):
-                    orderId = filtered_data[i]["OrderID"]["S"]
-                    parsed_event_transcription = json.loads(get_event_transcription(orderId))
-                    sound_url = parsed_event_transcription['sound']
-                    duration_in_second = get_audio_duration(sound_url)
-                    vector_store_id = save_meeting_content_to_vector_store(active_events[i].summary, parsed_event_transcription['content'])
-
-                    active_events[i].orderId = orderId
-                    active_events[i].status = 'finished'
-                    active_events[i].duration = duration_in_second
-                    active_events[i].vectorStoreId = vector_store_id
-
-                    active_events[i].save()
+        orders = list(
+            TranskriptorOrder.objects.filter(
+                status='processing',
+                indexing_requested_at__isnull=False,
+                vector_store_id__isnull=True
+            ).select_related('calendar_event', 'transcript').order_by('indexing_requested_at')[:settings.VECTOR_STORE_BATCH_SIZE]
+        )
+        if orders:
+            run_vector_store_step(ingest_transcripts, orders)
 
-    except requests.exceptions.RequestException as e:
-        print(f"HTTP request failed: {e}")
-    except json.JSONDecodeError as e:
-        print(f"Failed to parse JSON response: {e}")
-    except KeyError as e:
-        print(f"Missing expected key in parsed data: {e}")
+        run_vector_store_step(finish_indexed_orders)
+    finally:
+        release_lock("vector-store-ingest", lock)
+
+def run_vector_store_step(step, *args):
+    """
+    Function to run one vector store step of the ingestion tick, leaving its failures to the next tick.
+    """
+    try:
+        step(*args)
+    except openai.RateLimitError as e:
+        defer('openai', retry_after_seconds(e.response.headers))
+        print(f"OpenAI rate limited the vector store ingestion: {e}")
+    except RateLimited as e:
+        print(f"Vector store ingestion deferred: {e}")
+    except openai.APIError as e:
+        print(f"Vector store ingestion failed: {e}")
+
+def finish_indexed_orders():
+    """
+    Function to finish the pipeline of every order whose vector store has processed its files.
+    """
+    for order in claim_indexed_orders():
+        finish_order_pipeline(order)
+
+@shared_task
+def mark_finished(payload):
+    """
+    Pipeline stage copying the order results onto its CalendarEvent and finishing both.
+    """
+    order = TranskriptorOrder.objects.select_related('calendar_event').get(id=payload['order'])
+    if order.status == 'processed':
+        return payload
+
+    with transaction.atomic():
+        calendar_event = order.calendar_event
+        if calendar_event is not None:
+            calendar_event.orderId = str(order.order_id)
+            calendar_event.status = 'finished'
+            calendar_event.duration = order.duration
+            calendar_event.vectorStoreId = order.vector_store_id
+            calendar_event.save()
+
+        order.status = 'processed'
+        order.save(update_fields=['status'])
+
+    return payload
+
+@shared_task(
+    bind=True,
+    autoretry_for=(openai.APIError, AssistantRunError),
+    retry_backoff=True,
+    max_retries=3,
+    # Every artifact is one assistant run, each bounded by CHATBOT_STREAM_TIMEOUT
+    soft_time_limit=settings.CHATBOT_STREAM_TIMEOUT * len(STANDARD_ARTIFACTS) + 60,
+    time_limit=settings.CHATBOT_STREAM_TIMEOUT * len(STANDARD_ARTIFACTS) + 90
+)
+def precompute_meeting_artifacts(self, payload):
+    """
+    Pipeline stage answering the standard questions (summary, action items, speakers) ahead of time.
+    """
+    order = TranskriptorOrder.objects.get(id=payload['order'])
+    # Answers are cached for weeks, so they are only computed once the store holds every file
+    if order.vector_store_id and order.indexed_at:
+        try:
+            precompute_artifacts(order.vector_store_id)
+        except openai.RateLimitError as e:
+            retry_after = retry_after_seconds(e.response.headers)
+            defer('openai', retry_after)
+            raise self.retry(countdown=retry_after, exc=e)
+        except RateLimited as e:
+            raise self.retry(countdown=e.retry_after, exc=e)
+
+@shared_task
+def release_order(order_pk):
+    """
+    Error callback putting an order whose pipeline failed back to pending for the next tick,
+    or failing it for good once ORDER_PIPELINE_MAX_ATTEMPTS runs failed.
+    Its store stays, but must be claimed again to finish once the pipeline reruns.
+    """
+    orders = TranskriptorOrder.objects.filter(id=order_pk, status='processing')
+    if orders.filter(attempts__gte=settings.ORDER_PIPELINE_MAX_ATTEMPTS).update(status='failed', indexed_at=None):
+        print(f"Pipeline of order {order_pk} failed {settings.ORDER_PIPELINE_MAX_ATTEMPTS} times, giving up")
+        return
+    orders.update(status='pending', indexed_at=None)
+
+@shared_task
+def join_meeting_bot(calendar_event_id, scheduled_for):
+    """
+    ETA task that adds the meeting bot to an event exactly once, at its start time.
+    """
+    try:
+        calendar_event = CalendarEvent.objects.get(id=calendar_event_id)
+    except CalendarEvent.DoesNotExist:
+        return
+
+    # The event was deleted, lost its link or was moved after this task was scheduled
+    if calendar_event.status != 'active' or not calendar_event.hangout_link:
+        return
+    if calendar_event.start_time != isoparse(scheduled_for):
+        return
+
+    # Claiming the event atomically keeps redelivered or duplicate tasks from joining twice
+    claimed = CalendarEvent.objects.filter(
+        id=calendar_event_id,
+        bot_dispatched_at__isnull=True
+    ).update(bot_dispatched_at=timezone.now())
+    if not claimed:
+        return
+
+    if not add_meeting_bot(calendar_event.hangout_link):
+        # Let the next scheduling pass retry while the meeting is still within the grace period
+        CalendarEvent.objects.filter(id=calendar_event_id).update(
+            bot_dispatched_at=None, bot_task_id=None, bot_scheduled_for=None
+        )
+
+@shared_task(
+    bind=True,
+    max_retries=5,
+    soft_time_limit=settings.CALENDAR_SYNC_ACCOUNT_TIMEOUT,
+    time_limit=settings.CALENDAR_SYNC_ACCOUNT_TIMEOUT + 15
+)
+def sync_google_calendar_account(self, credentials_id, lock=None):
+    """
+    Task to sync the calendar of a single GoogleCredentials row.
+    Quota errors requeue the task once the budget allows instead of dropping the tick.
+
+    'lock' is the owner token of the calendar-sync:<id> lock taken when the task was queued.
+    The task refreshes it when it starts, so a sync whose lock expired while it waited in the
+    queue and was handed to a newer sync of the account steps aside instead of running twice.
+    """
+    lock_name = f"calendar-sync:{credentials_id}"
+    lock = lock or acquire_lock(lock_name, settings.CALENDAR_SYNC_ACCOUNT_TIMEOUT + 30)
+    if not lock or not refresh_lock(lock_name, lock, settings.CALENDAR_SYNC_ACCOUNT_TIMEOUT + 30):
+        print(f"Calendar sync for credentials {credentials_id} is held by another sync, skipping")
+        return
+
+    requeued = False
+    try:
+        google_credentials = GoogleCredentials.objects.get(id=credentials_id)
+        credentials = get_credentials(google_credentials)
+        service = calendar_service(credentials)
+        event_count = sync_google_calendar(google_credentials, service)
+        # AuthorizedHttp refreshes on a 401 if the token was revoked before its expiry
+        save_credentials(google_credentials, credentials)
+        print(f"Event numbers {event_count}")
+
+    except GoogleCredentials.DoesNotExist:
+        print(f"Google credentials {credentials_id} no longer exist")
+    except RateLimited as e:
+        requeued = requeue(self, e.retry_after)
+    except HttpError as e:
+        if not is_rate_limit_error(e):
+            print(f"Error updating events for credentials {credentials_id}: {e}")
+        else:
+            retry_after = retry_after_seconds(e.resp)
+            # A per-user quota error only concerns this account, a 429 the whole project
+            if e.resp.status == 429:
+                defer('google', retry_after)
+            requeued = requeue(self, retry_after)
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        print(f"Error updating events for credentials {credentials_id}: {e}")
+    finally:
+        if requeued:
+            # A requeued sync keeps the account lock so the dispatcher does not queue it twice
+            refresh_lock(lock_name, lock, settings.CALENDAR_SYNC_QUEUE_TIMEOUT)
+        else:
+            release_lock(lock_name, lock)
+            # A change notified while this sync was running gets a sync of its own
+            if cache.delete(sync_dirty_key(credentials_id)):
+                request_account_sync(credentials_id)
 
 @shared_task
 def update_all_google_calendar_events():
-    # Fetch all GoogleCredentials from the database
-    credentials_list = GoogleCredentials.objects.all()
-    for google_credentials in credentials_list:
-        try:
-            credentials = google.oauth2.credentials.Credentials(
-                token=google_credentials.token,
-                refresh_token=google_credentials.refresh_token,
-                token_uri=google_credentials.token_uri,
-                client_id=google_credentials.client_id,
-                client_secret=google_credentials.client_secret,
-                scopes=google_credentials.scopes.split(',')
-            )
-
-            service = build('calendar', 'v3', credentials=credentials)
-            now = datetime.utcnow().isoformat() + 'Z' 
-            events_result = service.events().list(
-                calendarId='primary', timeMin=now
-            ).execute()
-            events = events_result.get('items', [])
-            print(f"Event numbers {len(events)}")
-            for event in events:
-                start_time = event['start'].get('dateTime')
-                event_start_time = isoparse(start_time)
-                # event_start_time = datetime.fromisoformat(start_time[:-1])
-                CalendarEvent.objects.update_or_create(
-                    google_credentials=google_credentials,
-                    event_id=event['id'],
-                    defaults={
-                        'summary': event.get('summary', ''),
-                        'description': event.get('description', ''),
-                        'location': event.get('location', ''),
-                        'start_time': event['start'].get('dateTime'),
-                        'end_time': event['end'].get('dateTime'),
-                        'organizer_email': event['organizer'].get('email'),
-                        'creator_email': event['creator'].get('email'),
-                        'hangout_link': event.get('hangoutLink'),
-                        'conference_id': event.get('conferenceData', {}).get('conferenceId'),
-                        'conference_solution_name': event.get('conferenceData', {}).get('conferenceSolution', {}).get('name')
-                    }
-                )
-                # Check if the event is starting within the next few minutes
-                current_time = timezone.now()  # Get the current time
-                time_difference = event_start_time - current_time
-
-                if timedelta(minutes=-5) <= time_difference <= timedelta(minutes=5):  # Check if the event is about to start
-                    # Automatically add the meeting bot
-                    meeting_url = event.get('hangoutLink')
-                    if meeting_url:
-                        is_added = add_meeting_bot(meeting_url)
-                        if is_added == True:
-                            pass
-                        else:
-                            pass
-
-        except Exception as e:
-            print(f"Error updating events for {google_credentials.email}: {e}")
-
-    handle_finished_events_history()
\ No newline at end of file
+    """
+    Beat task that fans every connected account out to its own sync task, or with
+    CALENDAR_SYNC_MODE 'async' syncs them all concurrently on one event loop.
+    """
+    lock = acquire_lock("calendar-sync", settings.CALENDAR_SYNC_DISPATCH_TIMEOUT)
+    if not lock:
+        print("Previous calendar sync tick is still running, skipping")
+        return
+
+    try:
+        # Accounts with a watch channel are synced on notification and only polled as a safety net
+        if settings.CALENDAR_SYNC_MODE == 'async':
+            history = sync_all_google_calendars(accounts_due_for_sync())
+        else:
+            history = None
+            for credentials_id in accounts_due_for_sync().values_list('id', flat=True):
+                # An account whose previous sync is still queued or running skips this tick
+                lock = acquire_lock(f"calendar-sync:{credentials_id}", settings.CALENDAR_SYNC_QUEUE_TIMEOUT)
+                if lock:
+                    sync_google_calendar_account.delay(credentials_id, lock)
+                else:
+                    print(f"Calendar sync for credentials {credentials_id} is still running, skipping")
+
+        # Events that just entered the scheduling horizon get their bot-join ETA task
+        schedule_pending_bot_joins()
+
+        handle_finished_events_history(history)
+        print(f"Transkriptor latency: {get_client().metrics()}")
+        print(f"Rate limit budget: {budget_report()}")
+    finally:
+        release_lock("calendar-sync", lock)
+
+@shared_task
+def refresh_google_credentials():
+    """
+    Beat task refreshing the access tokens about to expire, so syncs start with a valid one.
+    """
+    lock = acquire_lock("credentials-refresh", settings.GOOGLE_TOKEN_REFRESH_TIMEOUT)
+    if not lock:
+        print("Previous credentials refresh is still running, skipping")
+        return
+
+    try:
+        refreshed = refresh_expiring_credentials()
+        print(f"Refreshed {refreshed} Google access tokens")
+    finally:
+        release_lock("credentials-refresh", lock)
+
+@shared_task
+def renew_google_watch_channels():
+    """
+    Beat task replacing the calendar watch channels that are about to expire.
+    """
+    lock = acquire_lock("watch-channel-renewal", settings.GOOGLE_CALENDAR_WATCH_RENEW_TIMEOUT)
+    if not lock:
+        print("Previous watch channel renewal is still running, skipping")
+        return
+
+    try:
+        opened = renew_watch_channels()
+        print(f"Opened {opened} calendar watch channels")
+    finally:
+        release_lock("watch-channel-renewal", lock)
@@ -1,3 +1,317 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.models import CustomUser
+from .models import CalendarEvent, CalendarWatchChannel, GoogleCredentials, TranskriptorOrder, VectorStoreFile
+from .orders import match_pending_orders, record_new_orders
+from .rate_limits import RateLimited
+from .search import index_transcript_terms
+from .sync import upsert_account_events
+from .tasks import ingest_transcript_batch
+from .transcripts import store_transcript
+from .watch import delete_google_credentials
+from .vector_stores import (
+    LocalVectorStore, OpenAIVectorStore, chunk_transcript, claim_indexed_orders, get_vector_store,
+    group_chunks, ingest_transcripts
+)
+
+CONTENT = [
+    {'Speaker': 'Ada', 'text': 'Welcome everyone.', 'StartTime': 0, 'EndTime': 2000},
+    {'Speaker': 'Ada', 'text': 'Let us start.', 'StartTime': 2000, 'EndTime': 4000},
+    {'Speaker': 'Grace', 'text': 'The release is ready.', 'StartTime': 4000, 'EndTime': 7000},
+    {'Speaker': 'Ada', 'text': 'Ship it on Friday.', 'StartTime': 7000, 'EndTime': 9000},
+    {'Speaker': 'Grace', 'text': 'I will write the notes.', 'StartTime': 9000, 'EndTime': 12000},
+]
+
+
+@override_settings(
+    VECTOR_STORE_BACKEND='calendar_api_service.vector_stores.LocalVectorStore',
+    VECTOR_STORE_CHUNK={'WINDOW': 3, 'OVERLAP': 1, 'PER_FILE': 1},
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+)
+class VectorStoreIngestionTests(TestCase):
+    def setUp(self):
+        get_vector_store.cache_clear()
+        self.addCleanup(get_vector_store.cache_clear)
+        self.vector_store = get_vector_store()
+
+    def create_order(self, order_id, content=CONTENT):
+        order = TranskriptorOrder.objects.create(order_id=order_id, status='processing')
+        store_transcript(order, {'content': content, 'sound': 'https://example.com/sound.mp3'})
+        order.indexing_requested_at = order.created_at
+        order.save(update_fields=['indexing_requested_at'])
+        return TranskriptorOrder.objects.select_related('calendar_event', 'transcript').get(id=order.id)
+
+    def test_chunks_overlap_by_speaker_turn(self):
+        chunks = chunk_transcript(CONTENT)
+
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(chunks[0].startswith('[00:00:00 - 00:00:09] Speakers: Ada, Grace'))
+        self.assertIn('Ada : Welcome everyone. Let us start.', chunks[0])
+        # The last turn of a chunk opens the next one
+        self.assertTrue(chunks[1].split('\n')[1].startswith('Ada : Ship it on Friday.'))
+
+    def test_chunks_are_packed_into_fewer_files(self):
+        chunks = chunk_transcript(CONTENT)
+
+        self.assertEqual(group_chunks(chunks, per_file=2), ['\n\n'.join(chunks)])
+        self.assertEqual(group_chunks(chunks, per_file=1), chunks)
+
+    def test_identical_files_are_uploaded_once(self):
+        first, second = self.create_order(1), self.create_order(2)
+
+        ingest_transcripts([first, second])
+
+        self.assertEqual(VectorStoreFile.objects.count(), 2)
+        self.assertEqual(len(self.vector_store.files), 2)
+        self.assertNotEqual(first.vector_store_id, second.vector_store_id)
+        self.assertEqual(
+            self.vector_store.store_contents(first.vector_store_id),
+            self.vector_store.store_contents(second.vector_store_id)
+        )
+
+    def test_files_uploaded_before_are_reused(self):
+        ingest_transcripts([self.create_order(1)])
+
+        with mock.patch.object(LocalVectorStore, 'upload_files', wraps=self.vector_store.upload_files) as upload_files:
+            order = ingest_transcripts([self.create_order(2)])[0]
+
+        upload_files.assert_called_once_with({})
+        self.assertEqual(len(self.vector_store.store_contents(order.vector_store_id)), 2)
+
+    def test_stores_created_before_a_failure_are_kept(self):
+        first, second = self.create_order(1), self.create_order(2)
+        create_store = self.vector_store.create_store
+
+        def create_first_only(name, file_ids):
+            if name == '2':
+                raise RateLimited('openai', 5)
+            return create_store(name, file_ids)
+
+        with mock.patch.object(self.vector_store, 'create_store', side_effect=create_first_only):
+            with self.assertRaises(RateLimited):
+                ingest_transcripts([first, second])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNotNone(first.vector_store_id)
+        self.assertIsNone(second.vector_store_id)
+        self.assertEqual(list(self.vector_store.stores), [first.vector_store_id])
+
+    def test_orders_are_claimed_once_their_store_completes(self):
+        ingest_transcripts([self.create_order(1)])
+
+        with mock.patch.object(self.vector_store, 'store_status', return_value='in_progress'):
+            self.assertEqual(list(claim_indexed_orders()), [])
+
+        claimed = list(claim_indexed_orders())
+        self.assertEqual(len(claimed), 1)
+        self.assertIsNotNone(TranskriptorOrder.objects.get(id=claimed[0].id).indexed_at)
+        self.assertEqual(list(claim_indexed_orders()), [])
+
+    def test_failed_store_sends_the_order_back_to_ingestion(self):
+        order = ingest_transcripts([self.create_order(1)])[0]
+
+        with mock.patch.object(self.vector_store, 'store_status', return_value='failed'):
+            self.assertEqual(list(claim_indexed_orders()), [])
+
+        order.refresh_from_db()
+        self.assertIsNone(order.vector_store_id)
+        self.assertEqual(self.vector_store.stores, {})
+
+    @mock.patch('calendar_api_service.tasks.finish_order_pipeline')
+    def test_batch_task_finishes_orders_ingested_before_a_failure(self, finish_order_pipeline):
+        first, second = self.create_order(1), self.create_order(2)
+        create_store = self.vector_store.create_store
+
+        def create_first_only(name, file_ids):
+            if name == '2':
+                raise RateLimited('openai', 5)
+            return create_store(name, file_ids)
+
+        with mock.patch.object(self.vector_store, 'create_store', side_effect=create_first_only):
+            ingest_transcript_batch()
+
+        finished = [call.args[0].id for call in finish_order_pipeline.call_args_list]
+        self.assertEqual(finished, [first.id])
+
+        # The next tick ingests and finishes the order that was deferred
+        ingest_transcript_batch()
+        finished = [call.args[0].id for call in finish_order_pipeline.call_args_list]
+        self.assertEqual(finished, [first.id, second.id])
+        self.assertEqual(TranskriptorOrder.objects.filter(vector_store_id__isnull=True).count(), 0)
+
+    @override_settings(
+        VECTOR_STORE_BACKEND='calendar_api_service.vector_stores.OpenAIVectorStore',
+        VECTOR_STORE_CHUNK={'WINDOW': 3, 'OVERLAP': 1, 'PER_FILE': 32}
+    )
+    @mock.patch('calendar_api_service.vector_stores.acquire')
+    @mock.patch('calendar_api_service.vector_stores.OpenAI')
+    def test_openai_backend_uploads_one_file_and_makes_one_store_call_per_meeting(self, openai, acquire):
+        get_vector_store.cache_clear()
+        client = openai.return_value
+        client.files.create.side_effect = lambda **kwargs: mock.Mock(id=f"file-{kwargs['file'].name}")
+        client.beta.vector_stores.create.side_effect = lambda **kwargs: mock.Mock(id=f"vs-{kwargs['name']}")
+        orders = [
+            self.create_order(1),
+            self.create_order(2),
+            self.create_order(3, content=CONTENT[:3]),
+        ]
+
+        ingest_transcripts(orders)
+
+        self.assertIsInstance(get_vector_store(), OpenAIVectorStore)
+        # Each distinct transcript is one file, however many chunks it holds
+        self.assertEqual(client.files.create.call_count, 2)
+        self.assertEqual(client.beta.vector_stores.create.call_count, 3)
+        client.beta.vector_stores.file_batches.create.assert_not_called()
+        for call in client.beta.vector_stores.create.call_args_list:
+            self.assertEqual(len(call.kwargs['file_ids']), 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SearchTranscriptsScopeTests(TestCase):
+    def setUp(self):
+        self.ada = CustomUser.objects.create_user(email='ada@example.com', username='ada')
+        self.grace = CustomUser.objects.create_user(email='grace@example.com', username='grace')
+        self.create_transcript(1, self.ada, 'The budget for Ada is approved.')
+        self.create_transcript(2, self.grace, 'The budget for Grace is frozen.')
+        # An order never matched to an event belongs to nobody
+        self.create_transcript(3, None, 'The budget nobody owns.')
+
+    def create_transcript(self, order_id, owner, text):
+        calendar_event = None
+        if owner is not None:
+            start_time = timezone.now() - timedelta(hours=1)
+            calendar_event = CalendarEvent.objects.create(
+                summary=f"Meeting {order_id}", start_time=start_time, end_time=start_time + timedelta(minutes=30),
+                status='finished', owner=owner
+            )
+        order = TranskriptorOrder.objects.create(order_id=order_id, calendar_event=calendar_event, status='processing')
+        transcript = store_transcript(order, {'content': [{'Speaker': 'Speaker', 'text': text, 'StartTime': 0, 'EndTime': 1000}]})
+        index_transcript_terms(transcript)
+
+    def search(self, user, query):
+        response = self.client.get(
+            '/api/v1/google-calendar/search/',
+            {'q': query},
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_users_only_find_their_own_segments(self):
+        ada_hits = self.search(self.ada, 'budget')
+        grace_hits = self.search(self.grace, 'budget')
+
+        self.assertEqual([hit['orderId'] for hit in ada_hits], ['1'])
+        self.assertEqual([hit['orderId'] for hit in grace_hits], ['2'])
+
+    def test_other_users_terms_are_not_found(self):
+        self.assertEqual(self.search(self.ada, 'frozen'), [])
+        self.assertEqual(self.search(self.ada, 'nobody'), [])
+
+
+@override_settings(TRANSKRIPTOR_INITIAL_ORDER_ID=0, TRANSKRIPTOR_HISTORY_MEETING_URL_KEY='meetingUrl')
+class OrderMatchingTests(TestCase):
+    MEETING_URL = 'https://meet.google.com/abc-defg-hij'
+
+    def setUp(self):
+        start_time = timezone.now()
+        self.calendar_event = CalendarEvent.objects.create(
+            summary='Standup', start_time=start_time, end_time=start_time + timedelta(minutes=30),
+            hangout_link=self.MEETING_URL, conference_id='abc-defg-hij', bot_dispatched_at=start_time
+        )
+
+    def test_orders_are_matched_on_their_meeting_url(self):
+        record_new_orders([{'OrderID': {'S': '1'}, 'meetingUrl': {'S': self.MEETING_URL}}])
+
+        matched = match_pending_orders()
+
+        self.assertEqual([order.calendar_event_id for order in matched], [self.calendar_event.id])
+
+    def test_orders_without_a_meeting_url_are_left_for_review(self):
+        record_new_orders([{'OrderID': {'S': '1'}}])
+
+        self.assertEqual(match_pending_orders(), [])
+        order = TranskriptorOrder.objects.get(order_id=1)
+        self.assertEqual(order.status, 'unmatched')
+        self.assertIsNone(order.calendar_event_id)
+
+    @override_settings(ORDER_MATCH_MAX_AGE=60)
+    def test_orders_that_never_match_are_aged_out(self):
+        record_new_orders([
+            {'OrderID': {'S': '1'}, 'meetingUrl': {'S': 'https://meet.google.com/zzz-zzzz-zzz'}},
+            {'OrderID': {'S': '2'}, 'meetingUrl': {'S': 'https://meet.google.com/yyy-yyyy-yyy'}},
+        ])
+        TranskriptorOrder.objects.filter(order_id=1).update(created_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(match_pending_orders(), [])
+        self.assertEqual(
+            dict(TranskriptorOrder.objects.values_list('order_id', 'status')),
+            {1: 'unmatched', 2: 'pending'}
+        )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@mock.patch('calendar_api_service.sync.cancel_bot_join')
+@mock.patch('calendar_api_service.sync.schedule_bot_join')
+class UpsertAccountEventsTests(TestCase):
+    def setUp(self):
+        self.accounts = []
+        for name in ('ada', 'grace'):
+            user = CustomUser.objects.create_user(email=f'{name}@example.com', username=name)
+            self.accounts.append(GoogleCredentials.objects.create(user=user, email=user.email))
+
+    def google_event(self, event_id, summary='Standup', status='confirmed'):
+        return {
+            'id': event_id,
+            'status': status,
+            'summary': summary,
+            'start': {'dateTime': '2026-10-20T09:00:00Z'},
+            'end': {'dateTime': '2026-10-20T09:30:00Z'},
+        }
+
+    def test_events_of_many_accounts_are_written_together(self, schedule_bot_join, cancel_bot_join):
+        ada, grace = self.accounts
+        upsert_account_events([(ada, [self.google_event('shared')]), (grace, [self.google_event('shared')])])
+
+        created, updated = upsert_account_events([
+            (ada, [self.google_event('shared', summary='Moved standup'), self.google_event('new')]),
+            (grace, [self.google_event('shared', status='cancelled')]),
+        ])
+
+        self.assertEqual([event.event_id for event in created], ['new'])
+        self.assertEqual([(event.owner_id, event.summary) for event in updated], [(ada.user_id, 'Moved standup')])
+        self.assertEqual(
+            CalendarEvent.objects.get(google_credentials=grace, event_id='shared').status, 'deleted'
+        )
+        self.assertEqual(CalendarEvent.objects.get(google_credentials=ada, event_id='shared').status, 'active')
+        cancel_bot_join.assert_called_once()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@mock.patch('calendar_api_service.watch.acquire')
+@mock.patch('calendar_api_service.watch.get_credentials')
+@mock.patch('calendar_api_service.watch.calendar_service')
+class DeleteGoogleCredentialsTests(TestCase):
+    def test_watch_channels_are_stopped_before_the_account_is_deleted(self, calendar_service, get_credentials, acquire):
+        user = CustomUser.objects.create_user(email='ada@example.com', username='ada')
+        google_credentials = GoogleCredentials.objects.create(user=user, email=user.email)
+        CalendarWatchChannel.objects.create(
+            google_credentials=google_credentials, channel_id='channel', resource_id='resource',
+            token='token', expiration=timezone.now() + timedelta(days=1)
+        )
+
+        deleted = delete_google_credentials(GoogleCredentials.objects.filter(id=google_credentials.id))
+
+        self.assertEqual(deleted, 1)
+        calendar_service.return_value.channels.return_value.stop.assert_called_once_with(
+            body={'id': 'channel', 'resourceId': 'resource'}
+        )
+        self.assertFalse(GoogleCredentials.objects.exists())
+        self.assertFalse(CalendarWatchChannel.objects.exists())
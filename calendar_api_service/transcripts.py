@@ -0,0 +1,128 @@
+# transcripts.py
+import json, zlib
+
+from django.db import transaction
+
+from .models import Transcript, TranscriptSegmentBlock
+
+# Segments are stored in blocks so a range read only decompresses the blocks it touches
+BLOCK_SIZE = 256
+SPEAKER_KEY = 'Speaker'
+# Transkriptor segments carry millisecond offsets into the recording
+TRANSCRIPT_START_KEYS = ('StartTime', 'startTime', 'start_time', 'start')
+TRANSCRIPT_END_KEYS = ('EndTime', 'endTime', 'end_time', 'end')
+
+
+def segment_time(chat, keys):
+    """
+    Function to read a segment's start or end offset in milliseconds, if it has one.
+    """
+    for key in keys:
+        if chat.get(key) is not None:
+            return int(float(chat[key]))
+    return None
+
+def encode_block(segments, speaker_ids):
+    """
+    Function to encode segments as zlib-compressed columns, with speakers replaced by dictionary ids.
+    """
+    columns = {}
+    for position, chat in enumerate(segments):
+        for key, value in chat.items():
+            if key == SPEAKER_KEY:
+                value = speaker_ids.setdefault(value, len(speaker_ids))
+            columns.setdefault(key, [None] * len(segments))[position] = value
+    return zlib.compress(json.dumps(columns, separators=(',', ':')).encode())
+
+def decode_block(data, speakers):
+    columns = json.loads(zlib.decompress(bytes(data)))
+    segment_count = max((len(values) for values in columns.values()), default=0)
+    segments = [{} for _ in range(segment_count)]
+    for key, values in columns.items():
+        for position, value in enumerate(values):
+            if value is None:
+                continue
+            segments[position][key] = speakers[value] if key == SPEAKER_KEY else value
+    return segments
+
+def store_transcript(order, payload):
+    """
+    Function to save a Transkriptor transcript payload locally, once per order.
+    """
+    existing = Transcript.objects.filter(order=order).first()
+    if existing is not None:
+        return existing
+
+    content = payload.get('content') or []
+    end_times = [segment_time(chat, TRANSCRIPT_END_KEYS) for chat in content]
+    end_times = [end_time for end_time in end_times if end_time is not None]
+    speaker_ids = {}
+
+    with transaction.atomic():
+        transcript = Transcript.objects.create(
+            order=order,
+            owner_id=order.calendar_event.owner_id if order.calendar_event_id else None,
+            calendar_event_id=order.calendar_event_id,
+            sound_url=payload.get('sound'),
+            segment_count=len(content),
+            duration_ms=max(end_times) if end_times else None,
+            extra={key: value for key, value in payload.items() if key not in ('content', 'sound')}
+        )
+
+        blocks = []
+        for first_segment in range(0, len(content), BLOCK_SIZE):
+            segments = content[first_segment:first_segment + BLOCK_SIZE]
+            start_times = [segment_time(chat, TRANSCRIPT_START_KEYS) for chat in segments]
+            block_end_times = [segment_time(chat, TRANSCRIPT_END_KEYS) for chat in segments]
+            start_times = [start_time for start_time in start_times if start_time is not None]
+            block_end_times = [end_time for end_time in block_end_times if end_time is not None]
+            blocks.append(TranscriptSegmentBlock(
+                transcript=transcript,
+                first_segment=first_segment,
+                segment_count=len(segments),
+                start_ms=min(start_times) if start_times else None,
+                end_ms=max(block_end_times) if block_end_times else None,
+                data=encode_block(segments, speaker_ids)
+            ))
+        TranscriptSegmentBlock.objects.bulk_create(blocks)
+
+        transcript.speakers = [speaker for speaker, _ in sorted(speaker_ids.items(), key=lambda item: item[1])]
+        transcript.save(update_fields=['speakers'])
+
+    return transcript
+
+def read_segments(transcript, offset=0, limit=None, start_ms=None, end_ms=None):
+    """
+    Function to read a range of a stored transcript's segments, by segment index and/or time.
+
+    Only the blocks overlapping the requested range are loaded and decompressed.
+    Time bounds keep the segments overlapping [start_ms, end_ms).
+    """
+    blocks = transcript.blocks.order_by('first_segment')
+    if offset:
+        blocks = blocks.filter(first_segment__gt=offset - BLOCK_SIZE)
+    if limit is not None:
+        blocks = blocks.filter(first_segment__lt=offset + limit)
+    if start_ms is not None:
+        blocks = blocks.exclude(end_ms__lt=start_ms)
+    if end_ms is not None:
+        blocks = blocks.exclude(start_ms__gte=end_ms)
+
+    segments = []
+    for block in blocks:
+        for position, chat in enumerate(decode_block(block.data, transcript.speakers)):
+            index = block.first_segment + position
+            if index < offset or (limit is not None and index >= offset + limit):
+                continue
+            if start_ms is not None and (segment_time(chat, TRANSCRIPT_END_KEYS) or 0) < start_ms:
+                continue
+            if end_ms is not None and (segment_time(chat, TRANSCRIPT_START_KEYS) or 0) >= end_ms:
+                continue
+            segments.append(chat)
+    return segments
+
+def transcript_payload(transcript, segments):
+    """
+    Function to rebuild the Transkriptor response shape from a stored transcript.
+    """
+    return {**transcript.extra, 'sound': transcript.sound_url, 'content': segments}
@@ -0,0 +1,213 @@
+# transkriptor.py
+import json, random, threading, time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .rate_limits import RateLimited, acquire, defer, retry_after_seconds
+
+# Responses worth retrying; anything else is returned to the caller as is
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised instead of calling an endpoint whose circuit breaker is open.
+    """
+
+class RateLimitedError(requests.exceptions.RequestException):
+    """
+    Raised when a call could not get a Transkriptor rate limit token in time.
+    """
+
+class CircuitBreaker:
+    """
+    Stops calling an endpoint after 'threshold' consecutive failures. Once 'reset_timeout'
+    seconds have passed a single trial call is let through; its outcome closes or reopens it.
+    """
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: push the reopening forward so only this call goes through
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+class TranskriptorClient:
+    """
+    Client for the Transkriptor meeting bot API on a pooled keep-alive session.
+
+    Every call has connect/read timeouts and goes through a per-endpoint circuit breaker.
+    Idempotent calls are retried with jittered exponential backoff on connection errors,
+    timeouts and 429/5xx responses; joining a meeting is only retried when the connection
+    could not be opened, so a bot is never sent twice. Latency is recorded per endpoint.
+    """
+    def __init__(self, join_meeting_url, history_url, content_url, api_key, options=None):
+        options = {**settings.TRANSKRIPTOR_CLIENT, **(options or {})}
+        self.join_meeting_url = join_meeting_url
+        self.history_url = history_url
+        self.content_url = content_url
+        self.api_key = api_key
+        self.timeout = (options['CONNECT_TIMEOUT'], options['READ_TIMEOUT'])
+        self.max_retries = options['MAX_RETRIES']
+        self.backoff = options['BACKOFF']
+        self.backoff_max = options['BACKOFF_MAX']
+        self.breaker_options = (options['BREAKER_THRESHOLD'], options['BREAKER_RESET_TIMEOUT'])
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=options['POOL_SIZE'], pool_maxsize=options['POOL_SIZE'])
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.breakers = {}
+        self.latencies = {}
+        self.lock = threading.Lock()
+
+    def breaker(self, endpoint):
+        with self.lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(*self.breaker_options)
+            return self.breakers[endpoint]
+
+    def record_latency(self, endpoint, elapsed, failed):
+        with self.lock:
+            stats = self.latencies.setdefault(endpoint, {'calls': 0, 'errors': 0, 'total': 0.0, 'max': 0.0})
+            stats['calls'] += 1
+            stats['errors'] += int(failed)
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+
+    def metrics(self):
+        """
+        Function to return the call count, error count and mean/max latency in ms of each endpoint.
+        """
+        with self.lock:
+            return {
+                endpoint: {
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    'mean_ms': round(stats['total'] * 1000 / stats['calls'], 1),
+                    'max_ms': round(stats['max'] * 1000, 1),
+                }
+                for endpoint, stats in self.latencies.items()
+            }
+
+    def sleep_before_retry(self, attempt):
+        # Full jitter keeps workers that failed together from retrying together
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+
+    def request(self, endpoint, url, params=None, idempotent=True, timeout=None, stream=False, rate_limited=True):
+        breaker = self.breaker(endpoint)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Transkriptor {endpoint} circuit is open")
+            try:
+                if rate_limited:
+                    acquire('transkriptor')
+            except RateLimited as e:
+                raise RateLimitedError(str(e)) from e
+
+            delay = None
+            started = time.monotonic()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout or self.timeout, stream=stream)
+            except requests.exceptions.RequestException as e:
+                self.record_latency(endpoint, time.monotonic() - started, failed=True)
+                breaker.record_failure()
+                retryable = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+            else:
+                failed = response.status_code in RETRY_STATUS_CODES
+                self.record_latency(endpoint, time.monotonic() - started, failed=failed)
+                if not failed:
+                    breaker.record_success()
+                    return response
+                if response.status_code == 429:
+                    # Throttling is not an outage: hold every worker instead of tripping the breaker
+                    delay = retry_after_seconds(response.headers)
+                    defer('transkriptor', delay)
+                else:
+                    breaker.record_failure()
+                if not idempotent or attempt >= self.max_retries:
+                    return response
+                response.close()
+
+            if delay is None:
+                self.sleep_before_retry(attempt)
+            attempt += 1
+
+    def join_meeting(self, meeting_url):
+        parameters = {
+            "meetingUrl": meeting_url,
+            "language": "en-US",
+            "apiKey": self.api_key
+        }
+        return self.request('join_meeting', self.join_meeting_url, params=parameters, idempotent=False)
+
+    def get_history(self):
+        """
+        Function to fetch the orders history, which the API returns as a JSON-encoded JSON string.
+        """
+        response = self.request('history', self.history_url, params={"apiKey": self.api_key})
+        response.raise_for_status()
+        return json.loads(json.loads(response.text))
+
+    def get_content(self, order_id):
+        return self.request('content', self.content_url, params={"orderid": order_id})
+
+    def download(self, url, timeout=None):
+        """
+        Function to open a streamed download of a recording; use it as a context manager.
+        Recordings are served from storage, outside the Transkriptor API quota.
+        """
+        return self.request('download', url, timeout=timeout, stream=True, rate_limited=False)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Function to return the process-wide Transkriptor client, built from settings on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = TranskriptorClient(
+                settings.TRANSKRIPTOR_JOIN_MEETING_URL,
+                settings.TRANSKRIPTOR_GET_HISTORY_URL,
+                settings.TRANSKRIPTOR_GET_CONTENT_URL,
+                settings.TRANSKRIPTOR_API_KEY
+            )
+        return _client
+
+def set_client(client):
+    """
+    Function to swap the process-wide client, e.g. for one pointed at a local fake server.
+    Passing None rebuilds it from settings on next use.
+    """
+    global _client
+    with _client_lock:
+        _client = client
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import FetchGoogleCalendarEvents, AddCalendarEvent, DeleteCalendarEvent, JoinMeetingEvents, GoogleLogin, GoogleCallback, ConnectedEmails, DeleteEmails, FetchUpcomingEvents, FetchFinishedEvents, FetchTranscription, RunChatBot
+from .views import GoogleCalendarWebhook, FetchGoogleCalendarEvents, AddCalendarEvent, DeleteCalendarEvent, JoinMeetingEvents, GoogleLogin, GoogleCallback, ConnectedEmails, DeleteEmails, FetchUpcomingEvents, FetchFinishedEvents, FetchTranscription, SearchTranscripts, RunChatBot, stream_chat_bot
 
 urlpatterns = [
     path('auth/', GoogleLogin.as_view(), name='google-auth'),
     path('auth/callback', GoogleCallback.as_view(), name='google-auth-callback'),
+    path('webhook/', GoogleCalendarWebhook.as_view(), name='google-calendar-webhook'),
     path('connected-emails/', ConnectedEmails.as_view(), name='connected-emails'),
     path('delete-email/<str:email>/', DeleteEmails.as_view(), name='delete-email'), 
     path('fetch-meeting-invites/', FetchGoogleCalendarEvents.as_view(), name='list-connected-emails'),
@@ -13,5 +14,7 @@ urlpatterns = [
     path('delete-event/<str:id>/', DeleteCalendarEvent.as_view(), name='delete-event'),
     path('join-meeting/', JoinMeetingEvents.as_view(), name='join-meeting'), 
     path('fetch-transcription/', FetchTranscription.as_view(),  name='fetch-transcription'),
+    path('search/', SearchTranscripts.as_view(), name='search-transcripts'),
     path('chatbot/', RunChatBot.as_view(),  name='chat-with-openai'),
+    path('chatbot/stream/', stream_chat_bot, name='chat-with-openai-stream'),
 ]
@@ -0,0 +1,48 @@
+import secrets
+
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+
+# Deletes the lock only while it still holds the owner token of the caller
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _lock_key(name):
+    return f"lock:{name}"
+
+def acquire_lock(name, timeout):
+    """
+    Function to take a cache-backed lock shared by all workers.
+    Returns the owner token to release or refresh it with, or None when somebody else holds it.
+    """
+    # An int token is stored as is by the Redis cache backend, so the release script can compare it
+    owner = secrets.randbits(62) + 1
+    return owner if cache.add(_lock_key(name), owner, timeout) else None
+
+def refresh_lock(name, owner, timeout):
+    """
+    Function to extend a lock held by 'owner' to 'timeout' seconds from now, taking it again
+    if it expired meanwhile. Returns False when another owner holds it.
+    """
+    if cache.add(_lock_key(name), owner, timeout):
+        return True
+    if cache.get(_lock_key(name)) != owner:
+        return False
+    return cache.touch(_lock_key(name), timeout)
+
+def release_lock(name, owner):
+    """
+    Function to release a lock taken with acquire_lock, only if 'owner' still holds it:
+    a holder whose lock expired and was taken by someone else leaves the new one alone.
+    """
+    if isinstance(cache, RedisCache):
+        key = cache.make_and_validate_key(_lock_key(name))
+        client = cache._cache.get_client(key, write=True)
+        client.eval(RELEASE_LOCK_SCRIPT, 1, key, owner)
+    elif cache.get(_lock_key(name)) == owner:
+        cache.delete(_lock_key(name))
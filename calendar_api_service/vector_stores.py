@@ -0,0 +1,248 @@
+# vector_stores.py
+import hashlib, io, itertools, uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from openai import OpenAI
+
+from .models import TranskriptorOrder, VectorStoreFile
+from .rate_limits import acquire
+from .transcripts import SPEAKER_KEY, TRANSCRIPT_END_KEYS, TRANSCRIPT_START_KEYS, read_segments, segment_time
+
+
+class OpenAIVectorStore:
+    """
+    Vector store backend on OpenAI. Each store is created with its files in one call and the
+    provider embeds them in the background; claim_indexed_orders polls the stores until they are done.
+    """
+    name = 'openai'
+
+    def __init__(self):
+        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+
+    def _upload_file(self, content_hash, text):
+        file_stream = io.BytesIO(text.encode())
+        file_stream.name = f"transcript-{content_hash[:16]}.txt"
+        acquire('openai')
+        return self.client.files.create(file=file_stream, purpose='assistants').id
+
+    def upload_files(self, contents):
+        """
+        Generator uploading {content_hash: text} as one file each, VECTOR_STORE_UPLOAD_CONCURRENCY
+        at a time, and yielding (content_hash, file_id) as the uploads complete.
+        The first failure cancels the uploads not started yet and is raised once the ones in
+        flight are done, so every file that did upload is still yielded.
+        """
+        if not contents:
+            return
+        error = None
+        with ThreadPoolExecutor(max_workers=settings.VECTOR_STORE_UPLOAD_CONCURRENCY) as executor:
+            futures = {
+                executor.submit(self._upload_file, content_hash, text): content_hash
+                for content_hash, text in contents.items()
+            }
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                try:
+                    yield futures[future], future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+                        for pending in futures:
+                            pending.cancel()
+        if error is not None:
+            raise error
+
+    def create_store(self, name, file_ids):
+        """
+        Create a store holding the files, without waiting for them to be processed, and return its id.
+        """
+        acquire('openai')
+        return self.client.beta.vector_stores.create(name=name, file_ids=file_ids).id
+
+    def store_status(self, store_id):
+        """
+        Return 'in_progress' while the store processes its files, then 'completed' or 'failed'.
+        """
+        acquire('openai')
+        store = self.client.beta.vector_stores.retrieve(store_id)
+        if store.status == 'in_progress' or store.file_counts.in_progress:
+            return 'in_progress'
+        if store.status == 'completed' and not (store.file_counts.failed or store.file_counts.cancelled):
+            return 'completed'
+        return 'failed'
+
+    def delete_store(self, store_id):
+        # Cleanup of a store that never became usable; skips the limiter so it cannot be deferred
+        self.client.beta.vector_stores.delete(store_id)
+
+class LocalVectorStore:
+    """
+    In-process vector store backend for tests and offline runs. Nothing leaves the process.
+    """
+    name = 'local'
+
+    def __init__(self):
+        self.files = {}
+        self.stores = {}
+
+    def upload_files(self, contents):
+        for content_hash, text in contents.items():
+            file_id = f"file_local_{content_hash[:24]}"
+            self.files[file_id] = text
+            yield content_hash, file_id
+
+    def create_store(self, name, file_ids):
+        store_id = f"vs_local_{uuid.uuid4().hex}"
+        self.stores[store_id] = {'name': name, 'file_ids': list(file_ids)}
+        return store_id
+
+    def store_status(self, store_id):
+        # Local files are searchable as soon as the store exists
+        return 'completed'
+
+    def delete_store(self, store_id):
+        self.stores.pop(store_id, None)
+
+    def store_contents(self, store_id):
+        return [self.files[file_id] for file_id in self.stores[store_id]['file_ids']]
+
+@lru_cache(maxsize=None)
+def get_vector_store():
+    return import_string(settings.VECTOR_STORE_BACKEND)()
+
+def _format_ms(value):
+    if value is None:
+        return '--:--:--'
+    seconds = value // 1000
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def chunk_transcript(segments, window=None, overlap=None):
+    """
+    Function to cut a transcript into overlapping windows of speaker turns.
+
+    Consecutive segments of the same speaker form one turn; each chunk holds 'window'
+    turns and repeats the last 'overlap' turns of the previous chunk. Every chunk starts
+    with a header carrying its time range and speakers, so the metadata is searchable.
+    """
+    window = window or settings.VECTOR_STORE_CHUNK['WINDOW']
+    overlap = min(overlap if overlap is not None else settings.VECTOR_STORE_CHUNK['OVERLAP'], window - 1)
+
+    turns = []
+    for speaker, chats in itertools.groupby(segments, key=lambda chat: chat.get(SPEAKER_KEY)):
+        chats = list(chats)
+        turns.append({
+            'speaker': speaker,
+            'text': ' '.join(chat.get('text') or '' for chat in chats),
+            'start_ms': segment_time(chats[0], TRANSCRIPT_START_KEYS),
+            'end_ms': segment_time(chats[-1], TRANSCRIPT_END_KEYS),
+        })
+
+    chunks = []
+    for first in range(0, max(len(turns) - overlap, 1), window - overlap):
+        chunk_turns = turns[first:first + window]
+        if not chunk_turns:
+            break
+        speakers = sorted({str(turn['speaker']) for turn in chunk_turns})
+        header = (
+            f"[{_format_ms(chunk_turns[0]['start_ms'])} - {_format_ms(chunk_turns[-1]['end_ms'])}] "
+            f"Speakers: {', '.join(speakers)}"
+        )
+        body = '\n'.join(f"{turn['speaker']} : {turn['text']}" for turn in chunk_turns)
+        chunks.append(f"{header}\n{body}")
+    return chunks
+
+def group_chunks(chunks, per_file=None):
+    """
+    Function to pack consecutive chunks into the texts of fewer files, 'per_file' chunks each.
+    The chunk headers stay in the text, so every part of a file still carries its time range.
+    """
+    per_file = per_file or settings.VECTOR_STORE_CHUNK['PER_FILE']
+    return ['\n\n'.join(chunks[first:first + per_file]) for first in range(0, len(chunks), per_file)]
+
+def content_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def ingest_transcripts(orders):
+    """
+    Function to index the transcripts of many orders in one pass.
+
+    Each transcript's chunks are packed into a few files, deduplicated by content hash within
+    the batch and against every file uploaded before, and the missing files are uploaded
+    concurrently. Each order then gets its own vector store, created with its files in a single
+    call that does not wait for the provider to process them. Sets vector_store_id on the
+    orders; claim_indexed_orders tells when the stores are ready.
+    """
+    vector_store = get_vector_store()
+
+    hashes_by_order = {}
+    contents = {}
+    for order in orders:
+        hashes = []
+        for text in group_chunks(chunk_transcript(read_segments(order.transcript))):
+            file_hash = content_hash(text)
+            contents.setdefault(file_hash, text)
+            if file_hash not in hashes:
+                hashes.append(file_hash)
+        hashes_by_order[order.id] = hashes
+
+    file_ids = dict(
+        VectorStoreFile.objects.filter(backend=vector_store.name, content_hash__in=contents.keys())
+        .values_list('content_hash', 'file_id')
+    )
+    uploaded = {}
+    try:
+        for file_hash, file_id in vector_store.upload_files({
+            file_hash: text for file_hash, text in contents.items() if file_hash not in file_ids
+        }):
+            uploaded[file_hash] = file_id
+    finally:
+        # Recorded even when an upload failed, so the next tick does not upload these files again
+        VectorStoreFile.objects.bulk_create([
+            VectorStoreFile(backend=vector_store.name, content_hash=file_hash, file_id=file_id)
+            for file_hash, file_id in uploaded.items()
+        ], ignore_conflicts=True)
+    file_ids.update(uploaded)
+
+    for order in orders:
+        name = order.calendar_event.summary if order.calendar_event else str(order.order_id)
+        store_id = vector_store.create_store(name, [file_ids[file_hash] for file_hash in hashes_by_order[order.id]])
+        # Saved per order so a failure half-way keeps the stores already created
+        TranskriptorOrder.objects.filter(id=order.id).update(vector_store_id=store_id)
+        order.vector_store_id = store_id
+    return orders
+
+def claim_indexed_orders():
+    """
+    Generator yielding the ingested orders whose vector store finished processing its files.
+
+    Each order is claimed through indexed_at before it is yielded, so it is finished once even
+    when several ticks overlap. Orders whose store failed to process its files lose the store
+    and go back to the ingestion queue.
+    """
+    vector_store = get_vector_store()
+    orders = TranskriptorOrder.objects.filter(
+        status='processing',
+        vector_store_id__isnull=False,
+        indexed_at__isnull=True
+    ).select_related('calendar_event').order_by('indexing_requested_at')[:settings.VECTOR_STORE_BATCH_SIZE]
+
+    for order in orders:
+        store_status = vector_store.store_status(order.vector_store_id)
+        if store_status == 'in_progress':
+            continue
+        if store_status != 'completed':
+            print(f"Vector store of order {order.order_id} failed to process its files, ingesting it again")
+            try:
+                vector_store.delete_store(order.vector_store_id)
+            except Exception as e:
+                print(f"Could not delete vector store {order.vector_store_id}: {e}")
+            TranskriptorOrder.objects.filter(id=order.id).update(vector_store_id=None)
+            continue
+
+        if TranskriptorOrder.objects.filter(id=order.id, indexed_at__isnull=True).update(indexed_at=timezone.now()):
+            yield order
@@ -1,10 +1,13 @@
-import uuid, json
+import hmac, uuid, json
 import requests
-import google.oauth2.credentials
 
 from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -15,15 +18,27 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from asgiref.sync import async_to_sync
-from datetime import datetime
+from asgiref.sync import async_to_sync, sync_to_async
+from dateutil.parser import isoparse
 
 from .chat import *
-from .models import GoogleCredentials, CalendarEvent
+from .models import GoogleCredentials, CalendarEvent, CalendarWatchChannel, Transcript
 from authentication.models import CustomUser
 from .serializers import JoinMeetingRequestSerializer, CalendarEventSerializer
-from authentication.utils import token_required
+from .answers import get_cached_answer, cache_answer
+from .event_cache import content_etag, event_list_etag, get_cached_page, set_cached_page
+from .credentials import apply_credentials, get_credentials, save_credentials
+from .google_services import calendar_service, oauth2_service
+from .pagination import MAX_PAGE_SIZE, parse_page_size, paginate_events
+from .rate_limits import RateLimited
+from .scheduler import schedule_bot_join, cancel_bot_join
+from .search import search_transcripts
+from .sync import list_calendar_events, upsert_calendar_events
+from .transcripts import read_segments, transcript_payload
+from .transkriptor import get_client
+from .watch import delete_google_credentials, register_watch_channel, request_account_sync
+from authentication.utils import token_required, aget_token_user
+from notaq_backend.db_router import replica_reads
 
 # Create your views here.
 class GoogleLogin(APIView):
@@ -61,24 +76,51 @@ class GoogleCallback(APIView):
             flow.fetch_token(authorization_response=request.build_absolute_uri())
             credentials = flow.credentials
 
-            user_info_service = build('oauth2', 'v2', credentials=credentials)
+            user_info_service = oauth2_service(credentials)
             user_info = user_info_service.userinfo().get().execute()
             email = user_info['email']
             google_credentials, _ = GoogleCredentials.objects.get_or_create(email=email, user=user)
             google_credentials.email = email
-            google_credentials.token = credentials.token
-            google_credentials.refresh_token = credentials.refresh_token
+            apply_credentials(google_credentials, credentials)
             google_credentials.token_uri = credentials.token_uri
             google_credentials.client_id = credentials.client_id
             google_credentials.client_secret = credentials.client_secret
             google_credentials.scopes = ','.join(credentials.scopes)
             google_credentials.save()
 
+            # Without a channel the account is still picked up by the polling tick
+            if not google_credentials.watch_channels.exists():
+                try:
+                    register_watch_channel(google_credentials, calendar_service(credentials))
+                except Exception as e:
+                    print(f"Could not watch the calendar of {email}: {e}")
+
             return redirect(settings.REACT_APP_FRONTEND_URL)
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
+class GoogleCalendarWebhook(APIView):
+    """
+    Receiver for Google Calendar push notifications. Each notification of a known channel,
+    carrying its token, queues an incremental sync of that account only.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        channel_id = request.headers.get('X-Goog-Channel-ID')
+        channel = CalendarWatchChannel.objects.filter(channel_id=channel_id).first() if channel_id else None
+        if channel is None:
+            return Response({'error': 'Unknown channel'}, status=status.HTTP_404_NOT_FOUND)
+        if not hmac.compare_digest(request.headers.get('X-Goog-Channel-Token', ''), channel.token):
+            return Response({'error': 'Invalid channel token'}, status=status.HTTP_403_FORBIDDEN)
+
+        # 'sync' only confirms a new channel; 'exists' and 'not_exists' report a change
+        if request.headers.get('X-Goog-Resource-State') != 'sync':
+            request_account_sync(channel.google_credentials_id)
+        return Response(status=status.HTTP_200_OK)
+
 class FetchGoogleCalendarEvents(APIView):
     @method_decorator(token_required)
     @swagger_auto_schema(
@@ -99,39 +141,12 @@ class FetchGoogleCalendarEvents(APIView):
 
         try:
             google_credentials = GoogleCredentials.objects.get(email=email)
-            credentials = google.oauth2.credentials.Credentials(
-                token=google_credentials.token,
-                refresh_token=google_credentials.refresh_token,
-                token_uri=google_credentials.token_uri,
-                client_id=google_credentials.client_id,
-                client_secret=google_credentials.client_secret,
-                scopes=google_credentials.scopes.split(',')
-            )
-
-            service = build('calendar', 'v3', credentials=credentials)
-            now = datetime.utcnow().isoformat() + 'Z' 
-            events_result = service.events().list(
-                calendarId='primary', timeMin=now
-            ).execute()
-            events = events_result.get('items', [])
+            credentials = get_credentials(google_credentials)
+            service = calendar_service(credentials)
+            events, _ = list_calendar_events(service)
+            save_credentials(google_credentials, credentials)
             print(f"Event numbers {len(events)}")
-            for event in events:
-                CalendarEvent.objects.update_or_create(
-                    google_credentials=google_credentials,
-                    event_id=event['id'],
-                    defaults={
-                        'summary': event.get('summary', ''),
-                        'description': event.get('description', ''),
-                        'location': event.get('location', ''),
-                        'start_time': event['start'].get('dateTime'),
-                        'end_time': event['end'].get('dateTime'),
-                        'organizer_email': event['organizer'].get('email'),
-                        'creator_email': event['creator'].get('email'),
-                        'hangout_link': event.get('hangoutLink'),
-                        'conference_id': event.get('conferenceData', {}).get('conferenceId'),
-                        'conference_solution_name': event.get('conferenceData', {}).get('conferenceSolution', {}).get('name')
-                    }
-                )
+            upsert_calendar_events(google_credentials, events)
 
             return Response({
                 'email': google_credentials.email,
@@ -140,37 +155,94 @@ class FetchGoogleCalendarEvents(APIView):
         
         except GoogleCredentials.DoesNotExist:
             return Response({'error': 'Google credentials not found for user.'}, status=status.HTTP_404_NOT_FOUND)
+        except RateLimited as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(int(e.retry_after) + 1)}
+            )
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class FetchUpcomingEvents(APIView):
+class EventListView(APIView):
     """
-    Fetches upcoming events from the database for all connected accounts.
+    Base view listing the requesting user's events of one status, one keyset page at a time.
     """
+    event_status = None
+
     @method_decorator(token_required)
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor returned as next_cursor by the previous page", type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description=f"Page size, at most {MAX_PAGE_SIZE}", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('fields', openapi.IN_QUERY, description="Comma separated list of fields to return", type=openapi.TYPE_STRING),
+            openapi.Parameter('start', openapi.IN_QUERY, description="Only events starting at or after this ISO 8601 time", type=openapi.TYPE_STRING),
+            openapi.Parameter('end', openapi.IN_QUERY, description="Only events starting before this ISO 8601 time", type=openapi.TYPE_STRING),
+        ],
+        responses={
+            200: openapi.Response('Page of calendar events'),
+            400: openapi.Response('Error message')
+        }
+    )
     def get(self, request):
         try:
-            # Fetch active events that are starting from now onwards
-            events = CalendarEvent.objects.filter(status='active').order_by('start_time')
-            serializer = CalendarEventSerializer(events, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            # Dashboards poll these lists; answer from the version-keyed cache or with 304 when nothing changed
+            etag = event_list_etag(request.user.id, self.event_status, request.query_params)
+            refreshed = getattr(request, 'refreshed_access_token', None)
+            client_etags = [] if refreshed else parse_etags(request.headers.get('If-None-Match', ''))
+            if etag in client_etags:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            cached = get_cached_page(etag)
+            if cached is not None:
+                data, response_etag = cached
+                # Replica pages carry a tag of their own data, which only matches when nothing differs
+                if response_etag in client_etags:
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': response_etag})
+                return Response(data, status=status.HTTP_200_OK, headers={'ETag': response_etag})
+
+            fields = CalendarEventSerializer.parse_fields(request.query_params.get('fields'))
+            page_size = parse_page_size(request.query_params.get('limit'))
+
+            with replica_reads() as from_replica:
+                # Synced events of the user's accounts and the events the user added by hand
+                events = CalendarEvent.objects.filter(owner_id=request.user.id, status=self.event_status)
+                if request.query_params.get('start'):
+                    events = events.filter(start_time__gte=isoparse(request.query_params['start']))
+                if request.query_params.get('end'):
+                    events = events.filter(start_time__lt=isoparse(request.query_params['end']))
+                if fields:
+                    events = events.only(*{'id', 'start_time', *fields})
+
+                page, next_cursor = paginate_events(events, request.query_params.get('cursor'), page_size)
+                serializer = CalendarEventSerializer(page, many=True, fields=fields)
+                data = {'results': serializer.data, 'next_cursor': next_cursor}
+            if from_replica:
+                # The replica may lag the primary the list version comes from, so the page gets
+                # a tag of the data actually read instead of one a client could keep for good
+                response_etag = content_etag(data)
+                set_cached_page(etag, data, settings.DATABASE_REPLICA_PAGE_CACHE_TTL, response_etag)
+                if response_etag in client_etags:
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': response_etag})
+                return Response(data, status=status.HTTP_200_OK, headers={'ETag': response_etag})
+
+            set_cached_page(etag, data)
+            return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        
-class FetchFinishedEvents(APIView):
+
+class FetchUpcomingEvents(EventListView):
     """
-    Fetches finished events from the database for all connected accounts.
+    Fetches upcoming events from the database for the user's connected accounts.
     """
-    @method_decorator(token_required)
-    def get(self, request):
-        try:
-            # Fetch finished events that are starting from now onwards
-            events = CalendarEvent.objects.filter(status='finished').order_by('start_time')
-            serializer = CalendarEventSerializer(events, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-   
+    event_status = 'active'
+
+class FetchFinishedEvents(EventListView):
+    """
+    Fetches finished events from the database for the user's connected accounts.
+    """
+    event_status = 'finished'
+
 class JoinMeetingEvents(APIView):
     @swagger_auto_schema(
         request_body=JoinMeetingRequestSerializer,
@@ -189,13 +261,12 @@ class JoinMeetingEvents(APIView):
             print(meeting_url)
             
             if meeting_url:
-                parameters = {
-                    "meetingUrl": meeting_url,
-                    "language": "en-US",
-                    "apiKey": settings.TRANSKRIPTOR_API_KEY
-                }
+                try:
+                    response = get_client().join_meeting(meeting_url)
+                except requests.exceptions.RequestException as e:
+                    print(f"Failed to add Meeting Bot to {meeting_url}: {e}")
+                    return Response({"message": "Meeting bot service is unavailable"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-                response = requests.get(settings.TRANSKRIPTOR_JOIN_MEETING_URL, params = parameters)
                 if response.status_code == 200:
                     return Response({"message": "Meeting Bot Added Successfully.", "meeting_url": meeting_url}, status=status.HTTP_200_OK)
                 else:
@@ -221,7 +292,8 @@ class AddCalendarEvent(APIView):
 
         serializer = CalendarEventSerializer(data=data)
         if serializer.is_valid():
-            serializer.save()
+            calendar_event = serializer.save(owner_id=request.user.id)
+            schedule_bot_join(calendar_event)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -233,9 +305,10 @@ class DeleteCalendarEvent(APIView):
     @method_decorator(token_required)
     def delete(self, request, id):
         try:
-            event = CalendarEvent.objects.get(id=id, status='active')
+            event = CalendarEvent.objects.get(id=id, owner_id=request.user.id, status='active')
             event.status = 'deleted'
             event.save()
+            cancel_bot_join(event)
             return Response({'message': 'Event marked as deleted.'}, status=status.HTTP_200_OK)
         except CalendarEvent.DoesNotExist:
             return Response({'error': 'Event not found or already deleted.'}, status=status.HTTP_404_NOT_FOUND)
@@ -249,28 +322,92 @@ class ConnectedEmails(APIView):
 class DeleteEmails(APIView):
     @method_decorator(token_required)
     def delete(self, request, email):
-        try:
-            GoogleCredentials.objects.filter(email=email).delete()
-            return Response({'status': 'Successfully deleted the email'}, status=status.HTTP_200_OK)
-        except GoogleCredentials.DoesNotExist:
+        if not delete_google_credentials(GoogleCredentials.objects.filter(email=email, user_id=request.user.id)):
             return Response({'error': 'Email not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'status': 'Successfully deleted the email'}, status=status.HTTP_200_OK)
 
 class FetchTranscription(APIView):
     """
-    Function to fetch the transcription from order id
+    Function to fetch the transcription from order id.
+    Finished meetings are served from the local transcript store, optionally a range of it
+    selected with 'offset'/'limit' (segment index) or 'start_ms'/'end_ms' (time).
     """
     @method_decorator(token_required)
     def post(self, request):
-        parameters = {
-            "orderid": request.data['orderId']
-        }
-        transcription_res = requests.get(settings.TRANSKRIPTOR_GET_CONTENT_URL, params=parameters)
+        try:
+            transcript = Transcript.objects.filter(order__order_id=int(request.data['orderId'])).first()
+            range_params = {
+                key: int(request.data[key])
+                for key in ('offset', 'limit', 'start_ms', 'end_ms')
+                if request.data.get(key) is not None
+            }
+        except (KeyError, ValueError, TypeError):
+            return Response({"message": "A numeric orderId is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if transcript is not None:
+            segments = read_segments(transcript, **range_params)
+            return Response(transcript_payload(transcript, segments), status=status.HTTP_200_OK)
+
+        try:
+            transcription_res = get_client().get_content(request.data['orderId'])
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to fetch transcription {request.data['orderId']}: {e}")
+            return Response({"message": "Transcription service is unavailable"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
         if transcription_res.status_code == 200:
             parsed_data = json.loads(transcription_res.content)
             return Response(parsed_data, status=status.HTTP_200_OK)
         else:
             return Response({"message": "Transcription not found"}, status=status.HTTP_400_BAD_REQUEST)
 
+class SearchTranscripts(APIView):
+    """
+    Full-text search over the user's meeting transcripts, ranked with BM25.
+    """
+    @method_decorator(token_required)
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description='Search query, "quoted" words must match as a phrase', type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('speaker', openapi.IN_QUERY, description="Only segments of this speaker", type=openapi.TYPE_STRING),
+            openapi.Parameter('email', openapi.IN_QUERY, description="Only meetings of this connected account", type=openapi.TYPE_STRING),
+            openapi.Parameter('start', openapi.IN_QUERY, description="Only meetings starting at or after this ISO 8601 time", type=openapi.TYPE_STRING),
+            openapi.Parameter('end', openapi.IN_QUERY, description="Only meetings starting before this ISO 8601 time", type=openapi.TYPE_STRING),
+            openapi.Parameter('start_ms', openapi.IN_QUERY, description="Only segments from this offset into the meeting", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('end_ms', openapi.IN_QUERY, description="Only segments before this offset into the meeting", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('limit', openapi.IN_QUERY, description=f"Number of hits, at most {MAX_PAGE_SIZE}", type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            200: openapi.Response('Matching transcript segments'),
+            400: openapi.Response('Error message')
+        }
+    )
+    def get(self, request):
+        query = request.query_params.get('q')
+        if not query:
+            return Response({'error': 'q parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            transcripts = Transcript.objects.filter(owner_id=request.user.id)
+            if request.query_params.get('email'):
+                transcripts = transcripts.filter(calendar_event__google_credentials__email=request.query_params['email'])
+            if request.query_params.get('start'):
+                transcripts = transcripts.filter(calendar_event__start_time__gte=isoparse(request.query_params['start']))
+            if request.query_params.get('end'):
+                transcripts = transcripts.filter(calendar_event__start_time__lt=isoparse(request.query_params['end']))
+
+            with replica_reads():
+                hits = search_transcripts(
+                    query,
+                    transcripts=transcripts,
+                    speaker=request.query_params.get('speaker'),
+                    start_ms=int(request.query_params['start_ms']) if request.query_params.get('start_ms') else None,
+                    end_ms=int(request.query_params['end_ms']) if request.query_params.get('end_ms') else None,
+                    limit=parse_page_size(request.query_params.get('limit'))
+                )
+            return Response({'results': hits}, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 class RunChatBot(APIView):
     """
     Function to get the openai's response based on vector store id
@@ -284,7 +421,52 @@ class RunChatBot(APIView):
             return Response({"error": "Query and vectorStoreId are required."}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            response = async_to_sync(get_openai_assistant_response)(query, vector_store_id)
+            response = get_cached_answer(query, vector_store_id)
+            if response is None:
+                response = async_to_sync(get_openai_assistant_response)(query, vector_store_id)
+                cache_answer(query, vector_store_id, response)
             return Response({"response": response}, status=status.HTTP_200_OK)
         except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@csrf_exempt
+@require_POST
+async def stream_chat_bot(request):
+    """
+    Async view streaming the openai's response as Server-Sent Events.
+    Needs the ASGI application (notaq_backend/asgi.py) to stream without holding a worker.
+    """
+    user, new_access_token, error = await aget_token_user(request)
+    if error:
+        return JsonResponse({'error': error}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Request body must be JSON.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    query = data.get('query')
+    vector_store_id = data.get('vectorStoreId')
+    if not query or not vector_store_id:
+        return JsonResponse({"error": "Query and vectorStoreId are required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    cached_answer = await sync_to_async(get_cached_answer)(query, vector_store_id)
+
+    async def event_stream():
+        if new_access_token:
+            yield sse_event('access', {'access': new_access_token})
+        if cached_answer is not None:
+            yield sse_event('token', {'text': cached_answer})
+            yield sse_event('done', {'status': 'completed', 'cached': True})
+            return
+
+        async def remember_answer(answer):
+            await sync_to_async(cache_answer)(query, vector_store_id, answer)
+
+        async for event in stream_openai_assistant_response(query, vector_store_id, on_complete=remember_answer):
+            yield event
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,164 @@
+# watch.py
+import secrets, uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from celery import current_app
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+
+from .credentials import get_credentials, save_credentials
+from .google_services import calendar_service
+from .models import CalendarWatchChannel, GoogleCredentials
+from .rate_limits import acquire
+from .utils import acquire_lock
+
+SYNC_ACCOUNT_TASK = 'calendar_api_service.tasks.sync_google_calendar_account'
+
+
+def sync_dirty_key(credentials_id):
+    return f"calendar-sync-dirty:{credentials_id}"
+
+def request_account_sync(credentials_id):
+    """
+    Function to queue an incremental sync of one account. When one is already running the
+    account is flagged instead, and that sync queues another when it finishes.
+    """
+    lock = acquire_lock(f"calendar-sync:{credentials_id}", settings.CALENDAR_SYNC_QUEUE_TIMEOUT)
+    if lock:
+        current_app.send_task(SYNC_ACCOUNT_TASK, args=[credentials_id, lock])
+    else:
+        # Outlives the lock of a queued sync or of an async fleet sync, which holds accounts for the whole tick
+        cache.set(
+            sync_dirty_key(credentials_id), True,
+            max(settings.CALENDAR_SYNC_QUEUE_TIMEOUT, settings.CALENDAR_SYNC_DISPATCH_TIMEOUT)
+        )
+
+def register_watch_channel(google_credentials, service=None):
+    """
+    Function to open an events.watch channel on the account's primary calendar, pointed at
+    GOOGLE_CALENDAR_WEBHOOK_URL. Returns the channel, or None when no webhook is configured.
+    """
+    if not settings.GOOGLE_CALENDAR_WEBHOOK_URL:
+        return None
+
+    if service is None:
+        credentials = get_credentials(google_credentials)
+        service = calendar_service(credentials)
+    else:
+        credentials = None
+
+    body = {
+        'id': uuid.uuid4().hex,
+        'type': 'web_hook',
+        'address': settings.GOOGLE_CALENDAR_WEBHOOK_URL,
+        'token': secrets.token_urlsafe(32),
+        'params': {'ttl': str(settings.GOOGLE_CALENDAR_WATCH_TTL)},
+    }
+    acquire('google', google_credentials.id)
+    response = service.events().watch(calendarId='primary', body=body).execute()
+    if credentials is not None:
+        save_credentials(google_credentials, credentials)
+
+    return CalendarWatchChannel.objects.create(
+        google_credentials=google_credentials,
+        channel_id=body['id'],
+        resource_id=response['resourceId'],
+        token=body['token'],
+        # Google reports the expiration in milliseconds since the epoch
+        expiration=datetime.fromtimestamp(int(response['expiration']) / 1000, tz=dt_timezone.utc)
+    )
+
+def stop_watch_channel(channel, service):
+    """
+    Function to stop a channel at Google and forget it. Channels Google no longer knows are just dropped.
+    """
+    try:
+        acquire('google', channel.google_credentials_id)
+        service.channels().stop(body={'id': channel.channel_id, 'resourceId': channel.resource_id}).execute()
+    except HttpError as e:
+        if e.resp.status != 404:
+            raise
+    channel.delete()
+
+def delete_google_credentials(credentials):
+    """
+    Function to delete the Google accounts of the 'credentials' queryset after stopping their watch
+    channels at Google; the CASCADE alone would forget channels Google keeps notifying until
+    they expire. Channels that cannot be stopped (e.g. the account revoked access) are logged
+    and dropped with the account. Returns the number of accounts deleted.
+    """
+    for google_credentials in credentials.prefetch_related('watch_channels'):
+        channels = list(google_credentials.watch_channels.all())
+        if not channels:
+            continue
+        try:
+            service = calendar_service(get_credentials(google_credentials))
+            for channel in channels:
+                stop_watch_channel(channel, service)
+        except Exception as e:
+            print(f"Could not stop the watch channels of {google_credentials.email}: {e}")
+
+    _, deleted = credentials.delete()
+    return deleted.get(GoogleCredentials._meta.label, 0)
+
+def renew_watch_channels():
+    """
+    Function to give every account a channel that outlives the next renewal run.
+
+    Accounts whose newest channel expires within GOOGLE_CALENDAR_WATCH_RENEW_AHEAD (or that have
+    none) get a new channel first, then prune_watch_channels stops the old ones, so no change is
+    missed in between. Returns the number of channels opened.
+    """
+    opened = 0
+    if settings.GOOGLE_CALENDAR_WEBHOOK_URL:
+        deadline = timezone.now() + timedelta(seconds=settings.GOOGLE_CALENDAR_WATCH_RENEW_AHEAD)
+        covered = CalendarWatchChannel.objects.filter(expiration__gt=deadline).values('google_credentials')
+
+        for google_credentials in GoogleCredentials.objects.exclude(id__in=covered):
+            try:
+                register_watch_channel(google_credentials)
+                opened += 1
+            except Exception as e:
+                print(f"Could not renew the watch channel of {google_credentials.email}: {e}")
+
+    prune_watch_channels()
+    return opened
+
+def prune_watch_channels():
+    """
+    Function to forget expired channels and stop every channel replaced by a newer one of the
+    same account. Channels a previous run failed to stop are retried on each run.
+    Returns the number of channels removed.
+    """
+    removed, _ = CalendarWatchChannel.objects.filter(expiration__lte=timezone.now()).delete()
+
+    newest = CalendarWatchChannel.objects.filter(
+        google_credentials=OuterRef('google_credentials')
+    ).order_by('-expiration').values('id')[:1]
+    superseded = CalendarWatchChannel.objects.exclude(id=Subquery(newest)).select_related('google_credentials')
+
+    services = {}
+    for channel in superseded:
+        google_credentials = channel.google_credentials
+        try:
+            if google_credentials.id not in services:
+                credentials = get_credentials(google_credentials)
+                services[google_credentials.id] = calendar_service(credentials)
+            stop_watch_channel(channel, services[google_credentials.id])
+            removed += 1
+        except Exception as e:
+            print(f"Could not stop watch channel {channel.channel_id} of {google_credentials.email}: {e}")
+    return removed
+
+def accounts_due_for_sync():
+    """
+    Function to return the accounts the polling tick should sync: every account without a
+    live watch channel, and watched ones not synced for GOOGLE_CALENDAR_WATCH_POLL_INTERVAL.
+    """
+    now = timezone.now()
+    watched = CalendarWatchChannel.objects.filter(expiration__gt=now).values('google_credentials')
+    recently_synced = Q(last_synced_at__gt=now - timedelta(seconds=settings.GOOGLE_CALENDAR_WATCH_POLL_INTERVAL))
+    return GoogleCredentials.objects.exclude(Q(id__in=watched) & recently_synced)
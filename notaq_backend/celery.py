@@ -19,4 +19,16 @@ app.conf.beat_schedule = {
         'task': 'calendar_api_service.tasks.update_all_google_calendar_events',
         'schedule': 60.0,  
     },
+    'refresh-google-credentials-every-5-minutes': {
+        'task': 'calendar_api_service.tasks.refresh_google_credentials',
+        'schedule': 300.0,
+    },
+    'renew-google-watch-channels-every-hour': {
+        'task': 'calendar_api_service.tasks.renew_google_watch_channels',
+        'schedule': 3600.0,
+    },
+    'ingest-transcript-batch-every-30-seconds': {
+        'task': 'calendar_api_service.tasks.ingest_transcript_batch',
+        'schedule': 30.0,
+    },
 }
\ No newline at end of file
@@ -0,0 +1,44 @@
+# db_router.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA_DATABASE = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_DATABASE in settings.DATABASES
+
+@contextmanager
+def replica_reads():
+    """
+    Context manager sending the ORM reads made inside it to the read replica, when one is
+    configured. Yields whether reads actually go to the replica.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield replica_configured()
+    finally:
+        _replica_reads.reset(token)
+
+class ReplicaRouter:
+    """
+    Routes reads to the replica only inside replica_reads(); everything else, writes and
+    migrations included, uses the primary.
+    """
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured():
+            return REPLICA_DATABASE
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
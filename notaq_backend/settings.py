@@ -105,6 +105,15 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
 }
 
+# Authenticated requests resolve their user through a short-lived in-process LRU and,
+# when SHARED is on, the shared cache before falling back to the database
+AUTH_USER_CACHE = {
+    'TTL': int(os.getenv("AUTH_USER_CACHE_TTL", 30)),
+    'MAXSIZE': int(os.getenv("AUTH_USER_CACHE_MAXSIZE", 4096)),
+    'SHARED': os.getenv("AUTH_USER_CACHE_SHARED", "true").lower() == "true",
+    'SHARED_TTL': int(os.getenv("AUTH_USER_CACHE_SHARED_TTL", 300)),
+}
+
 ROOT_URLCONF = 'notaq_backend.urls'
 
 TEMPLATES = [
@@ -129,17 +138,107 @@ WSGI_APPLICATION = 'notaq_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_ENGINE=postgresql for deployments, SQLite stays the default for local runs
+DATABASE_ENGINE = os.getenv("DATABASE_ENGINE", 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    # DB_POOL sizes psycopg's connection pool; it cannot be combined with persistent
+    # connections, so CONN_MAX_AGE only applies without it. Behind PgBouncer in transaction
+    # mode (DB_PGBOUNCER) server-side cursors have to be disabled.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL", 0))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", 'notaq'),
+            'USER': os.getenv("DB_USER", 'notaq'),
+            'PASSWORD': os.getenv("DB_PASSWORD", ''),
+            'HOST': os.getenv("DB_HOST", 'localhost'),
+            'PORT': os.getenv("DB_PORT", '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(os.getenv("CONN_MAX_AGE", 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv("DB_PGBOUNCER", '') == '1',
+            'OPTIONS': {'pool': {'min_size': 1, 'max_size': DB_POOL_SIZE}} if DB_POOL_SIZE else {},
+        }
     }
-}
+    # Optional read replica for the list and search endpoints, see notaq_backend/db_router.py
+    if os.getenv("DB_REPLICA_HOST"):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv("DB_REPLICA_HOST"),
+            'PORT': os.getenv("DB_REPLICA_PORT", DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Seconds a connection waits on the write lock before 'database is locked'
+                'timeout': int(os.getenv("SQLITE_TIMEOUT", 20)),
+                # Take the write lock when a transaction starts, not when it first writes,
+                # so concurrent writers queue on busy_timeout instead of failing to upgrade
+                'transaction_mode': 'IMMEDIATE',
+                # WAL lets the web workers read while the Celery workers write
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA mmap_size=134217728;'
+                ),
+            },
+        }
+    }
+
+DATABASE_ROUTERS = ['notaq_backend.db_router.ReplicaRouter']
+# Event list pages read from the replica may lag the latest writes, so they are cached briefly
+DATABASE_REPLICA_PAGE_CACHE_TTL = int(os.getenv("DATABASE_REPLICA_PAGE_CACHE_TTL", 5))
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# Password hashing. PASSWORD_HASHER picks the hasher for new hashes: 'bcrypt', or 'argon2'
+# which needs argon2-cffi. Hashes made with another hasher or work factor are upgraded on the
+# next sign-in. Checks run on a pool of WORKERS threads with at most QUEUE more waiting.
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", 'bcrypt')
+SELECTABLE_PASSWORD_HASHERS = {
+    'bcrypt': 'authentication.hashing.TunedBCryptSHA256PasswordHasher',
+    'argon2': 'authentication.hashing.TunedArgon2PasswordHasher',
+}
+PASSWORD_HASHERS = [SELECTABLE_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in SELECTABLE_PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + [
+    # Hashes created before the hasher was configurable
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_HASHING = {
+    'WORKERS': int(os.getenv("PASSWORD_HASHING_WORKERS", 4)),
+    'QUEUE': int(os.getenv("PASSWORD_HASHING_QUEUE", 64)),
+    'BCRYPT_ROUNDS': int(os.getenv("PASSWORD_BCRYPT_ROUNDS", 12)),
+    'ARGON2_TIME_COST': int(os.getenv("PASSWORD_ARGON2_TIME_COST", 2)),
+    'ARGON2_MEMORY_COST': int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", 102400)),
+    'ARGON2_PARALLELISM': int(os.getenv("PASSWORD_ARGON2_PARALLELISM", 8)),
+}
+
+# Sign-in attempts allowed per client IP and per email
+REST_FRAMEWORK = {
+    # Reverse proxies in front of the app (the same one SECURE_PROXY_SSL_HEADER trusts); client IPs
+    # for throttling are read from the X-Forwarded-For entry they appended, never from one sent by
+    # the client. Set to 0 when requests reach the app directly.
+    'NUM_PROXIES': int(os.getenv("NUM_PROXIES", 1)),
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'authentication.authentication.CachedJWTAuthentication',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'sign_in': os.getenv("SIGN_IN_RATE", '20/min'),
+        'sign_in_email': os.getenv("SIGN_IN_EMAIL_RATE", '5/min'),
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -183,13 +282,76 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET") if os.getenv("GOOGLE_CL
 GOOGLE_REDIRECT_URL_FOR_AUTH = os.getenv("GOOGLE_REDIRECT_URL_FOR_AUTH") if os.getenv("GOOGLE_REDIRECT_URL_FOR_AUTH") else env["GOOGLE_REDIRECT_URL_FOR_AUTH"]
 GOOGLE_REDIRECT_URL_FOR_CALENDAR_API = os.getenv("GOOGLE_REDIRECT_URL_FOR_CALENDAR_API") if os.getenv("GOOGLE_REDIRECT_URL_FOR_CALENDAR_API") else env["GOOGLE_REDIRECT_URL_FOR_CALENDAR_API"]
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") if os.getenv("GOOGLE_API_KEY") else env["GOOGLE_API_KEY"]
+GOOGLE_API_TIMEOUT = int(os.getenv("GOOGLE_API_TIMEOUT", 30))
+# Access tokens are refreshed in the background when they expire within REFRESH_AHEAD seconds;
+# a sync only refreshes inline when its token expires within REFRESH_MARGIN seconds
+GOOGLE_TOKEN_REFRESH_AHEAD = int(os.getenv("GOOGLE_TOKEN_REFRESH_AHEAD", 900))
+GOOGLE_TOKEN_REFRESH_MARGIN = int(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN", 60))
+GOOGLE_TOKEN_REFRESH_BATCH_SIZE = int(os.getenv("GOOGLE_TOKEN_REFRESH_BATCH_SIZE", 200))
+GOOGLE_TOKEN_REFRESH_TIMEOUT = int(os.getenv("GOOGLE_TOKEN_REFRESH_TIMEOUT", 300))
+# Push notifications: public URL of the webhook view (watch channels are only opened when set),
+# requested channel lifetime and renewal lead time in seconds, and how often accounts with a
+# live channel are still polled as a safety net
+GOOGLE_CALENDAR_WEBHOOK_URL = os.getenv("GOOGLE_CALENDAR_WEBHOOK_URL")
+GOOGLE_CALENDAR_WATCH_TTL = int(os.getenv("GOOGLE_CALENDAR_WATCH_TTL", 7 * 24 * 3600))
+GOOGLE_CALENDAR_WATCH_RENEW_AHEAD = int(os.getenv("GOOGLE_CALENDAR_WATCH_RENEW_AHEAD", 24 * 3600))
+GOOGLE_CALENDAR_WATCH_RENEW_TIMEOUT = int(os.getenv("GOOGLE_CALENDAR_WATCH_RENEW_TIMEOUT", 1800))
+GOOGLE_CALENDAR_WATCH_POLL_INTERVAL = int(os.getenv("GOOGLE_CALENDAR_WATCH_POLL_INTERVAL", 3600))
 
 TRANSKRIPTOR_API_KEY = os.getenv("TRANSKRIPTOR_API_KEY") if os.getenv("TRANSKRIPTOR_API_KEY") else env["TRANSKRIPTOR_API_KEY"]
 TRANSKRIPTOR_JOIN_MEETING_URL = os.getenv("TRANSKRIPTOR_JOIN_MEETING_URL") if os.getenv("TRANSKRIPTOR_JOIN_MEETING_URL") else env["TRANSKRIPTOR_JOIN_MEETING_URL"]
 TRANSKRIPTOR_GET_HISTORY_URL = os.getenv("TRANSKRIPTOR_GET_HISTORY_URL") if os.getenv("TRANSKRIPTOR_GET_HISTORY_URL") else env["TRANSKRIPTOR_GET_HISTORY_URL"]
 TRANSKRIPTOR_GET_CONTENT_URL = os.getenv("TRANSKRIPTOR_GET_CONTENT_URL") if os.getenv("TRANSKRIPTOR_GET_CONTENT_URL") else env["TRANSKRIPTOR_GET_CONTENT_URL"]
+# History orders at or below this id predate order tracking and are never processed
+TRANSKRIPTOR_INITIAL_ORDER_ID = int(os.getenv("TRANSKRIPTOR_INITIAL_ORDER_ID", 1727253113783446562))
+# History field holding an order's meeting URL, the meetingUrl the bot was sent to join
+TRANSKRIPTOR_HISTORY_MEETING_URL_KEY = os.getenv("TRANSKRIPTOR_HISTORY_MEETING_URL_KEY", 'meetingUrl')
+# Seconds a pending order is retried against the synced events before it is set aside as
+# unmatched for manual review
+ORDER_MATCH_MAX_AGE = int(os.getenv("ORDER_MATCH_MAX_AGE", 24 * 3600))
+# Post-processing runs an order gets before it is marked failed instead of retried on the next tick
+ORDER_PIPELINE_MAX_ATTEMPTS = int(os.getenv("ORDER_PIPELINE_MAX_ATTEMPTS", 5))
+# Shared Transkriptor client (transkriptor.py): timeouts in seconds, retries of idempotent
+# calls with jittered backoff, keep-alive pool size and the per-endpoint circuit breaker
+TRANSKRIPTOR_CLIENT = {
+    'CONNECT_TIMEOUT': float(os.getenv("TRANSKRIPTOR_CONNECT_TIMEOUT", 3.05)),
+    'READ_TIMEOUT': float(os.getenv("TRANSKRIPTOR_READ_TIMEOUT", 30)),
+    'MAX_RETRIES': int(os.getenv("TRANSKRIPTOR_MAX_RETRIES", 3)),
+    'BACKOFF': float(os.getenv("TRANSKRIPTOR_BACKOFF", 0.5)),
+    'BACKOFF_MAX': float(os.getenv("TRANSKRIPTOR_BACKOFF_MAX", 8)),
+    'POOL_SIZE': int(os.getenv("TRANSKRIPTOR_POOL_SIZE", 20)),
+    'BREAKER_THRESHOLD': int(os.getenv("TRANSKRIPTOR_BREAKER_THRESHOLD", 5)),
+    'BREAKER_RESET_TIMEOUT': int(os.getenv("TRANSKRIPTOR_BREAKER_RESET_TIMEOUT", 30)),
+}
+
+# Recording duration probing: ffprobe/download timeout in seconds and the size ceiling for the decode fallback
+AUDIO_PROBE_TIMEOUT = int(os.getenv("AUDIO_PROBE_TIMEOUT", 30))
+AUDIO_PROBE_MAX_BYTES = int(os.getenv("AUDIO_PROBE_MAX_BYTES", 200 * 1024 * 1024))
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") if os.getenv("OPENAI_API_KEY") else env["OPENAI_API_KEY"]
+# Hard limit in seconds for a chatbot run, streamed or polled, before it is cancelled
+CHATBOT_STREAM_TIMEOUT = int(os.getenv("CHATBOT_STREAM_TIMEOUT", 120))
+# Memoized chatbot answers: TTLs in seconds for ad-hoc answers, precomputed meeting
+# artifacts and the in-process LRU in front of the shared cache
+CHAT_ANSWER_CACHE = {
+    'TTL': int(os.getenv("CHAT_ANSWER_CACHE_TTL", 24 * 3600)),
+    'ARTIFACT_TTL': int(os.getenv("CHAT_ARTIFACT_CACHE_TTL", 30 * 24 * 3600)),
+    'LOCAL_TTL': int(os.getenv("CHAT_ANSWER_CACHE_LOCAL_TTL", 300)),
+    'MAXSIZE': int(os.getenv("CHAT_ANSWER_CACHE_MAXSIZE", 1024)),
+}
+
+# Vector store ingestion: backend class, chunks of WINDOW speaker turns sharing OVERLAP
+# turns with the previous chunk, PER_FILE chunks packed into each uploaded file, the number of
+# meetings uploaded per batch and the number of file uploads in flight at once
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", 'calendar_api_service.vector_stores.OpenAIVectorStore')
+VECTOR_STORE_CHUNK = {
+    'WINDOW': int(os.getenv("VECTOR_STORE_CHUNK_WINDOW", 8)),
+    'OVERLAP': int(os.getenv("VECTOR_STORE_CHUNK_OVERLAP", 2)),
+    'PER_FILE': int(os.getenv("VECTOR_STORE_CHUNKS_PER_FILE", 32)),
+}
+VECTOR_STORE_BATCH_SIZE = int(os.getenv("VECTOR_STORE_BATCH_SIZE", 50))
+VECTOR_STORE_UPLOAD_CONCURRENCY = int(os.getenv("VECTOR_STORE_UPLOAD_CONCURRENCY", 8))
+VECTOR_STORE_INGEST_TIMEOUT = int(os.getenv("VECTOR_STORE_INGEST_TIMEOUT", 600))
 
 CLIENT_CONFIG = {
     "web": {
@@ -217,3 +379,73 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ROUTES = {
+    'calendar_api_service.tasks.sync_google_calendar_account': {'queue': 'calendar_sync'},
+    'calendar_api_service.tasks.refresh_google_credentials': {'queue': 'low_priority'},
+    'calendar_api_service.tasks.renew_google_watch_channels': {'queue': 'low_priority'},
+    # Finished-meeting pipeline, one queue per stage so each can be scaled separately
+    'calendar_api_service.tasks.fetch_transcript': {'queue': 'transcripts'},
+    'calendar_api_service.tasks.build_search_index': {'queue': 'indexing'},
+    'calendar_api_service.tasks.probe_duration': {'queue': 'audio'},
+    'calendar_api_service.tasks.request_indexing': {'queue': 'indexing'},
+    'calendar_api_service.tasks.ingest_transcript_batch': {'queue': 'indexing'},
+    'calendar_api_service.tasks.precompute_meeting_artifacts': {'queue': 'indexing'},
+}
+
+# Outbound rate limits shared by all workers through Redis: RATE tokens per second with
+# bursts of up to BURST. '<provider>_account' buckets apply per credential on top.
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", CELERY_BROKER_URL)
+RATE_LIMITS = {
+    'google': {
+        'RATE': float(os.getenv("GOOGLE_RATE_LIMIT", 10)),
+        'BURST': int(os.getenv("GOOGLE_RATE_LIMIT_BURST", 20)),
+    },
+    'google_account': {
+        'RATE': float(os.getenv("GOOGLE_ACCOUNT_RATE_LIMIT", 1)),
+        'BURST': int(os.getenv("GOOGLE_ACCOUNT_RATE_LIMIT_BURST", 5)),
+    },
+    'transkriptor': {
+        'RATE': float(os.getenv("TRANSKRIPTOR_RATE_LIMIT", 5)),
+        'BURST': int(os.getenv("TRANSKRIPTOR_RATE_LIMIT_BURST", 10)),
+    },
+    'openai': {
+        'RATE': float(os.getenv("OPENAI_RATE_LIMIT", 2)),
+        'BURST': int(os.getenv("OPENAI_RATE_LIMIT_BURST", 10)),
+    },
+}
+# Seconds a call may wait for a token before its task is requeued instead
+RATE_LIMIT_MAX_WAIT = int(os.getenv("RATE_LIMIT_MAX_WAIT", 10))
+# Used when a 429 comes without a Retry-After header
+RATE_LIMIT_DEFAULT_RETRY_AFTER = int(os.getenv("RATE_LIMIT_DEFAULT_RETRY_AFTER", 30))
+# 429 answers an async request waits out before giving up
+RATE_LIMIT_MAX_DEFERRALS = int(os.getenv("RATE_LIMIT_MAX_DEFERRALS", 3))
+
+# Shared cache, also used for the cross-worker task locks
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    }
+}
+
+# Serialized event list pages are cached per list version, which every event write bumps
+EVENT_LIST_CACHE_TTL = int(os.getenv("EVENT_LIST_CACHE_TTL", 600))
+
+# Calendar sync fan-out. Concurrency is the number of worker processes consuming the
+# 'calendar_sync' queue (celery -A notaq_backend worker -Q calendar_sync -c <n>)
+CALENDAR_SYNC_ACCOUNT_TIMEOUT = int(os.getenv("CALENDAR_SYNC_ACCOUNT_TIMEOUT", 45))
+CALENDAR_SYNC_DISPATCH_TIMEOUT = int(os.getenv("CALENDAR_SYNC_DISPATCH_TIMEOUT", 600))
+# How long a queued account sync holds its account before a later tick may queue another;
+# the task shortens the lock to CALENDAR_SYNC_ACCOUNT_TIMEOUT + 30 once it starts
+CALENDAR_SYNC_QUEUE_TIMEOUT = int(os.getenv("CALENDAR_SYNC_QUEUE_TIMEOUT", 900))
+# 'fanout' queues one task per account; 'async' lists every account on one event loop in the
+# dispatcher, with at most CALENDAR_SYNC_CONCURRENCY requests in flight
+CALENDAR_SYNC_MODE = os.getenv("CALENDAR_SYNC_MODE", 'fanout')
+CALENDAR_SYNC_CONCURRENCY = int(os.getenv("CALENDAR_SYNC_CONCURRENCY", 100))
+CALENDAR_SYNC_WRITE_BATCH = int(os.getenv("CALENDAR_SYNC_WRITE_BATCH", 50))
+
+# Bot joins are ETA tasks; only events starting within the horizon are queued so ETAs stay
+# well below the Redis visibility timeout. Late events are still joined within the grace period.
+BOT_JOIN_SCHEDULE_HORIZON = int(os.getenv("BOT_JOIN_SCHEDULE_HORIZON", 1800))
+BOT_JOIN_GRACE_PERIOD = int(os.getenv("BOT_JOIN_GRACE_PERIOD", 300))